@@ -1,67 +1,445 @@
 from connectFour import Board, Player
-import pygame
-from copy import deepcopy
+from bitboard import Position
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from evaluation import get_evaluator
+from parallel import RootPool
+from openingBook import OpeningBook
+from solver import Solver, SolverBudgetExceeded
+from instrumentation import SearchInstrument
 import random
+import time
+
+# Depth stored for won and full positions in the transposition table, deeper than any real search
+TERMINAL_DEPTH = 1000
+
+# How many nodes are searched between each look at the clock
+CLOCK_CHECK_NODES = 256
+
+# With a time limit, the part of it the exact solver may use before we give up and search normally
+SOLVER_TIME_SHARE = 0.5
+
+class SearchTimeout(Exception):
+     # Raised inside the search when the time budget runs out, the unfinished depth is thrown away
+     pass
 
 class Ai_player(Player):
-     def __init__(self, color, name, depth):
+     def __init__(self, color, name, depth, alphabeta=True, table_mb=16, time_limit_ms=None, workers=1, book=None, solve_below=None, solved_database=None, on_search=None, symmetry=False):
           super().__init__(color, name)
           self.depth = depth
+          self.alphabeta = alphabeta
+          self.nodes = 0 # Positions visited by the latest search
+
+          # With a time limit, the search goes one depth deeper at a time until the time is up
+          # and depth is only the deepest it is allowed to go (None for as deep as the board allows)
+          self.time_limit_ms = time_limit_ms
+          self.deadline = None
+          self.completed_depth = 0 # Deepest search the latest move finished
+          self.iterations = [] # (depth, nodes, seconds, row) for every depth iterative deepening finished
+          self.source = None # Where the latest move came from: "book", "solver", "parallel" or "search"
+
+          # The transposition table is kept between turns (and games), so later moves can reuse earlier work
+          # Only the alpha-beta search uses it. Set table_mb to 0 to turn it off
+          self.table_mb = table_mb
+          self.table = TranspositionTable(table_mb) if table_mb else None
+          self.table_context = None
+
+          # With more than one worker the root moves are split over a process pool (see parallel.py)
+          # The pool is started on the first search and kept until close()
+          self.workers = workers
+          self.pool = None
+
+          # Path to an opening book made with openingBook.py, positions in it are answered without searching
+          self.book = OpeningBook(book) if isinstance(book, str) else book
+
+          # With solve_below, positions with that many empty spots or fewer are solved exactly instead (see solver.py)
+          # The value returned for those is the solver's score, not the heuristic one
+          # solved_database is the sqlite file the solved positions are kept in between games
+          self.solve_below = solve_below
+          self.solved_database = solved_database
+          self.solver = None
+
+          # Called with a dict of statistics after every search, see instrumentation.py
+          self.on_search = on_search
+
+          # With symmetry, a position and its mirror image (flipped left to right) share one transposition table
+          # entry, and on a symmetric board only one of every mirrored pair of root moves is searched.
+          # The evaluation reads its lines in one direction, so it isn't exactly the same for a position and
+          # its mirror. Moves can come out different from the normal search, which is why this is off by default
+          self.symmetry = symmetry
+
+     def __getstate__(self):
+          # The process pool can't be sent to another process, that copy starts its own if it needs one
+          state = self.__dict__.copy()
+          state["pool"] = None
+          return state
+
+     def get_pool(self):
+          if self.pool is None:
+               self.pool = RootPool(self.workers)
+          return self.pool
+
+     def close(self):
+          if self.pool is not None:
+               self.pool.close()
+               self.pool = None
      
      def turn(self, game):
-          value, move = self.minimax(game.board, self.depth, self, game)
-          pygame.time.delay(1000)
-          return move
+          position = Position.from_board(game.board, game.nInRow, game.Player1, game.Player2, game.currentPlayer)
+          value, row = self.search(position)
+          # The time limit is only for the search, this delay is just so we can see the moves (skipped when headless)
+          game.pause(1000)
+          return row, game.getTopPos(row)
+
+     def search(self, position):
+          # Returns (value, row) for the player to move in this position
+          if self.on_search is None:
+               return self.find_move(position)
+
+          instrument = SearchInstrument(self, position)
+          instrument.attach()
+          start = time.perf_counter()
+          try:
+               value, row = self.find_move(position)
+          finally:
+               instrument.detach()
+          self.on_search(instrument.event(position, value, row, time.perf_counter() - start))
+          return value, row
+
+     def find_move(self, position):
+          self.iterations = []
+          self.side = position.turn
+          self.nodes = 0
+          self.deadline = None
+          deadline = None
+          if self.time_limit_ms is not None:
+               deadline = time.perf_counter() + self.time_limit_ms / 1000
+
+          if self.book is not None:
+               found = self.book.lookup(position, self.symmetry)
+               if found is not None:
+                    self.completed_depth = self.book.depth
+                    self.source = "book"
+                    return found
+
+          empty = position.rows * position.columns - position.moves
+          if self.solve_below is not None and empty <= self.solve_below:
+               if self.solver is None:
+                    self.solver = Solver(self.solved_database)
+               # With a time limit the solver gets part of it, and if it isn't done by then the normal search
+               # gets the rest. What the solver found so far stays in its table for the next move
+               if deadline is not None:
+                    self.solver.deadline = time.perf_counter() + SOLVER_TIME_SHARE * self.time_limit_ms / 1000
+               nodes = self.solver.nodes
+               try:
+                    result = self.solver.best_move(position)
+               except SolverBudgetExceeded:
+                    result = None
+               finally:
+                    self.solver.deadline = None
+                    self.nodes = self.solver.nodes - nodes
+               if result is not None:
+                    self.completed_depth = empty
+                    self.source = "solver"
+                    return result
+
+          max_depth = max(1, position.rows * position.columns - position.moves)
+          if self.depth is not None:
+               max_depth = min(max_depth, self.depth)
+
+          if self.workers > 1:
+               self.source = "parallel"
+               return self.parallel_search(position, max_depth, deadline)
+
+          self.source = "search"
+
+          if self.alphabeta:
+               self.prepare_alphabeta(position, max_depth)
+
+          if deadline is None:
+               self.completed_depth = max_depth
+               return self.search_to_depth(position, max_depth)
+          return self.iterative_deepening(position, max_depth, deadline)
+
+     def iterative_deepening(self, position, max_depth, deadline):
+          # Depth 1 is always finished so there is a move to return, after that we stop when time runs out
+          # The best move from the last depth is searched first in the next one
+          start = time.perf_counter()
+          result = None
+          self.completed_depth = 0
+          for depth in range(1, max_depth + 1):
+               if depth > 1:
+                    self.deadline = deadline
+               try:
+                    result = self.search_to_depth(position.copy(), depth, None if result is None else result[1])
+               except SearchTimeout:
+                    break
+               self.completed_depth = depth
+               self.iterations.append((depth, self.nodes, time.perf_counter() - start, result[1]))
+               if time.perf_counter() >= deadline:
+                    break
+          self.deadline = None
+          return result
+
+     def parallel_search(self, position, max_depth, deadline=None):
+          # Same as search, but every root move is a job for the pool. Also deepens one depth at a time with a time limit
+          pool = self.get_pool()
+          if deadline is None:
+               value, row, nodes = pool.search(self, position, max_depth)
+               self.nodes += nodes
+               self.completed_depth = max_depth
+               return value, row
+
+          start = time.perf_counter()
+          result = None
+          self.completed_depth = 0
+          for depth in range(1, max_depth + 1):
+               searched = pool.search(self, position, depth, None if depth == 1 else deadline)
+               if searched is None:
+                    break
+               result = searched[:2]
+               self.nodes += searched[2]
+               self.completed_depth = depth
+               self.iterations.append((depth, self.nodes, time.perf_counter() - start, result[1]))
+               if time.perf_counter() >= deadline:
+                    break
+          return result
+
+     def search_root_move(self, position, row, depth, budget=None):
+          # The exact value of playing row in this position, searched to depth (counting the move itself)
+          # This is what every job in the parallel search does
+          self.side = position.turn
+          self.nodes = 1
+          self.deadline = None if budget is None else time.perf_counter() + budget
+          self.search_depth = depth
+          if self.alphabeta:
+               self.prepare_alphabeta(position, depth)
 
-     def minimax(self, board, depth, player, game, latest_move=None):
+          position.play(row)
+          try:
+               if self.alphabeta:
+                    return self.alphabeta_search(position, depth-1, float("-inf"), float("inf"), self.side ^ 1)
+               return self.minimax(position, depth-1, self.side ^ 1, row)[0]
+          finally:
+               position.undo()
+               self.deadline = None
+
+     def search_to_depth(self, position, depth, first_move=None):
+          self.search_depth = depth
+          if not self.alphabeta:
+               return self.minimax(position, depth, self.side)
+          return self.alphabeta_root(position, depth, first_move)
+
+     def check_time(self):
+          if self.deadline is not None and self.nodes % CLOCK_CHECK_NODES == 0 and time.perf_counter() >= self.deadline:
+               raise SearchTimeout()
+
+     def prepare_alphabeta(self, position, max_depth):
+          # The stored values depend on which side the ai is playing, and on the board
+          context = (self.side, position.rows, position.columns, position.nInRow)
+          if self.table is not None and self.table_context != context:
+               self.table.clear()
+               self.table_context = context
+
+          self.killers = [[None, None] for _ in range(max_depth + 1)]
+          self.history_scores = [[0] * position.rows for _ in range(2)]
+          self.center_order = sorted(range(position.rows), key=lambda row: abs(2*row - (position.rows-1)))
+
+     def minimax(self, position, depth, side, latest_move=None):
+          # The search runs on a bitboard Position and works with rows (the move), not (row, column)
+          # Like before, only the ai's own connections end the search early. The opponent's show up in the evaluation
+          self.nodes += 1
+          self.check_time()
           if not latest_move is None:
-               if depth <= 0 or game.checkWin(latest_move, game.nInRow):
-                    return self.evaluate(board, game, depth), latest_move
-          
-          if player == self:
+               if depth <= 0 or position.has_won(self.side) or position.full():
+                    return self.evaluate(position, self.side), latest_move
+
+          rows = self.get_all_rows(position)
+          if latest_move is None:
+               rows = self.root_rows(position, rows)
+
+          if side == self.side:
                maxEval = float("-inf")
                best_move = None
-               for row in self.get_all_rows(board, player, game):
-                    move = (row, game.getTopPos(row))
-                    board = self.simulate_move(board, move, player, game)
-                    evaluation = self.minimax(board, depth-1, game.otherPlayer, game, move)[0]
-                    board = self.undo_move(board, move, game)
+               for row in rows:
+                    position.play(row)
+                    evaluation = self.minimax(position, depth-1, side ^ 1, row)[0]
+                    position.undo()
                     maxEval = max(maxEval, evaluation)
                     if maxEval == evaluation:
-                         best_move = move
-               
+                         best_move = row
+
                return maxEval, best_move
           else:
                minEval = float("inf")
                best_move = None
-               for row in self.get_all_rows(board, player, game):
-                    move = (row, game.getTopPos(row))
-                    board = self.simulate_move(board, move, player, game)
-                    evaluation = self.minimax(board, depth-1, self, game, move)[0]
-                    board = self.undo_move(board, move, game)
+               for row in rows:
+                    position.play(row)
+                    evaluation = self.minimax(position, depth-1, side ^ 1, row)[0]
+                    position.undo()
                     minEval = min(minEval, evaluation)
                     if minEval == evaluation:
-                         best_move = move
-               
+                         best_move = row
+
                return minEval, best_move
 
-     def simulate_move(self, board, move, player, game):
-          game.board[move[0]][move[1]] = player
-          self.draw_moves(game)
+     def alphabeta_root(self, position, depth, first_move=None):
+          # The full-width search keeps the last row (from left to right) with the best value
+          # Searching every root move with alpha just below the best value so far gives exact values for ties,
+          # so we can break them the same way no matter which order the moves were searched in
+          self.nodes += 1
+          best_value = float("-inf")
+          best_move = None
+          if first_move is None:
+               first_move = self.table_move(position)
+          for row in self.root_rows(position, self.order_moves(position, self.side, 0, first_move)):
+               alpha = float("-inf") if best_move is None else best_value - 1
+               position.play(row)
+               evaluation = self.alphabeta_search(position, depth-1, alpha, float("inf"), self.side ^ 1)
+               position.undo()
+               if evaluation > best_value or (evaluation == best_value and row > best_move):
+                    best_value = evaluation
+                    best_move = row
+
+          if self.table is not None and best_move is not None:
+               key, mirrored = self.table_key(position)
+               self.table.store(key, depth, EXACT, best_value, position.rows - 1 - best_move if mirrored else best_move)
+          return best_value, best_move
+
+     def alphabeta_search(self, position, depth, alpha, beta, side):
+          self.nodes += 1
+          self.check_time()
+          entry = None
+          key = position.hash
+          mirrored = False
+          if self.table is not None:
+               if self.symmetry:
+                    key, mirrored = self.table_key(position)
+               entry = self.table.probe(key)
+               if entry is not None and entry[1] >= depth:
+                    value = entry[3]
+                    if entry[2] == EXACT or (entry[2] == LOWER and value >= beta) or (entry[2] == UPPER and value <= alpha):
+                         return value
+
+          if position.has_won(self.side) or position.full():
+               # This value doesn't change no matter how deep we would have searched
+               value = self.evaluate(position, self.side)
+               if self.table is not None:
+                    self.table.store(key, TERMINAL_DEPTH, EXACT, value, None)
+               return value
+          if depth <= 0:
+               value = self.evaluate(position, self.side)
+               if self.table is not None:
+                    self.table.store(key, 0, EXACT, value, None)
+               return value
+
+          ply = self.search_depth - depth
+          table_move = None if entry is None else entry[4]
+          if mirrored and table_move is not None:
+               table_move = position.rows - 1 - table_move
+          alpha_start = alpha
+          beta_start = beta
+          best_move = None
+          if side == self.side:
+               maxEval = float("-inf")
+               for row in self.order_moves(position, side, ply, table_move):
+                    position.play(row)
+                    evaluation = self.alphabeta_search(position, depth-1, alpha, beta, side ^ 1)
+                    position.undo()
+                    if evaluation > maxEval:
+                         maxEval = evaluation
+                         best_move = row
+                    alpha = max(alpha, evaluation)
+                    if alpha >= beta:
+                         self.store_cutoff(row, side, ply, depth)
+                         break
+
+               value = maxEval
+          else:
+               minEval = float("inf")
+               for row in self.order_moves(position, side, ply, table_move):
+                    position.play(row)
+                    evaluation = self.alphabeta_search(position, depth-1, alpha, beta, side ^ 1)
+                    position.undo()
+                    if evaluation < minEval:
+                         minEval = evaluation
+                         best_move = row
+                    beta = min(beta, evaluation)
+                    if alpha >= beta:
+                         self.store_cutoff(row, side, ply, depth)
+                         break
+
+               value = minEval
+
+          if self.table is not None:
+               if value <= alpha_start:
+                    bound = UPPER
+               elif value >= beta_start:
+                    bound = LOWER
+               else:
+                    bound = EXACT
+               if mirrored and best_move is not None:
+                    best_move = position.rows - 1 - best_move
+               self.table.store(key, depth, bound, value, best_move)
+          return value
+
+     def table_key(self, position):
+          # Returns (key, mirrored): the key the position is stored under, and if moves are stored mirrored
+          if self.symmetry and position.mirror_hash < position.hash:
+               return position.mirror_hash, True
+          return position.hash, False
+
+     def table_move(self, position):
+          if self.table is None:
+               return None
+          key, mirrored = self.table_key(position)
+          entry = self.table.probe(key)
+          if entry is None or entry[4] is None:
+               return None
+          return position.rows - 1 - entry[4] if mirrored else entry[4]
+
+     def root_rows(self, position, rows):
+          # On a symmetric board a row and its mirror lead to the same game, so only the right one of the two is kept
+          # (the one a tie would pick anyway)
+          if not self.symmetry or not position.is_symmetric():
+               return rows
+          return [row for row in rows if 2*row >= position.rows - 1]
+
+     def order_moves(self, position, side, ply, table_move=None):
+          # The best move the transposition table remembers from this position goes first
+          # Then winning moves, then moves that block the opponent's win, then the killer moves for this ply,
+          # then whatever has caused the most cutoffs so far, and the middle rows before the edges
+          playable = position.playable_mask()
+          wins = position.winning_spots(side) & playable
+          blocks = position.winning_spots(side ^ 1) & playable
+          killers = self.killers[ply]
+          history = self.history_scores[side]
 
-     def undo_move(self, board, move, game):
-          game.board[move[0]][move[1]] = None
-          # self.draw_moves(game)
+          def priority(row):
+               bit = position.bit(row, position.heights[row])
+               if row == table_move:
+                    return (0, 0)
+               if wins & bit:
+                    return (1, 0)
+               if blocks & bit:
+                    return (2, 0)
+               if row in killers:
+                    return (3, 0)
+               return (4, -history[row])
 
-     def get_all_rows(self, board, player, game):
-          rows = []
-          for row in range(game.rows):
-               column = game.getTopPos(row)
-               if not column < 0:
-                    rows.append(row)
-          return rows
+          rows = [row for row in self.center_order if position.heights[row] < position.columns]
+          return sorted(rows, key=priority)
 
-     def evaluate(self, board, game, depth):
+     def store_cutoff(self, row, side, ply, depth):
+          killers = self.killers[ply]
+          if killers[0] != row:
+               killers[1] = killers[0]
+               killers[0] = row
+          self.history_scores[side][row] += depth * depth
+
+     def get_all_rows(self, position):
+          return position.legal_rows()
+
+     def evaluate(self, position, side):
           # This is going to be the hardest part
           # I'm thinking loop through all the diagonals, both left and right of any length bigger than 2
           # Then all the columns, which are easy
@@ -88,128 +466,19 @@ class Ai_player(Player):
           # 3 in a row - 3 points
           # 4 in a row - 10000 points
 
-          ai_score = 0
-          other_score = 0
-          for row in range(game.rows):
-               for column in range(game.columns):
-                    if game.board[row][column] is None:
-                         continue # We skip if the starting spot is empty
-
-                    directions_lists = self.get_all_directions_positions(row, column, game)
-                    for direction in directions_lists:
-                         ai_score += self.evaluate_list(deepcopy(direction), self, game)
-                         other_score += self.evaluate_list(deepcopy(direction), game.otherPlayer, game)
-          
-          # Now for the discs in the middle
-          # If the rows are uneven, just count the discs that are in row = game.rows//2
-          # Else, count the two middle pillars, like game.rows//2 and game.rows//2 + 1
-          middle_list = []
-          if game.rows % 2 == 0:
-               middle_list.append(self.get_row((game.rows//2, 0), game))
-               middle_list.append(self.get_row((game.rows//2 + 1, 0), game))
-          else:
-               middle_list.append(self.get_row((game.rows//2, 0), game))
-          for middle in middle_list:
-               middle_names = [middle[i].name if not middle[i] is None else None for i in range(len(middle))]
-               ai_score += middle_names.count(self.name) * 4
-               other_score += middle_names.count(game.otherPlayer.name) * 4
-          
-          return (ai_score - other_score)
-     
-     def get_all_directions_positions(self, row, column, game):
-          lists = []
-          lists.append(self.get_row((row, column), game))
-          lists.append(self.get_column((row, column), game))
-          lists.append(self.get_diagonal((row, column), "left", game))
-          lists.append(self.get_diagonal((row, column), "right", game))
-          return lists
-
-     def get_diagonal(self, position, direction, game):
-          base_row = position[0]
-          base_column = position[1]
-          diagonal_list = []
-          change = 1 if direction == "left" else -1
-
-          while True:
-               diagonal_list.append(game.board[base_row][base_column])
-               base_column += 1
-               base_row += change
-               if base_row < 0 or base_row > game.rows-1 or base_column > game.columns-1:
-                    break
-          
-          return diagonal_list
-
-
-     def get_column(self, position, game):
-          column_list = [game.board[position[0] + (i - position[0])][position[1]] for i in range(position[0], game.rows)]
-          return column_list
-
-     def get_row(self, position, game):
-          row_list = [game.board[position[0]][position[1] + (i - position[1])] for i in range(position[1], game.columns)]
-          return row_list
-
-     def evaluate_list(self, positions, player, game):
-          score = 0
-          if len(positions) < 2:
-               return score
-
-          # We are going to take the first nInRow spots and evaluate those
-          # When we are done evaluating, pop the first item and repeate
-          # When the gets to less than / equal to nInRow, we don't evaluate if the starting spot is the opposite player
-          while len(positions) > game.nInRow:
-               active_positions = positions[:game.nInRow]
-               disc_count = 0
-               for position in active_positions:
-                    if position is None:
-                         continue
-                    elif position.name == player.name:
-                         disc_count += 1
-                    else: # This is the opponents piece
-                         if disc_count <= 1:
-                              disc_count = 0
-                         return score + disc_count # We stop everything and simply return the score for this list
-               # If we are here, there were no opponent discs. Count the discs and pop the list
-               positions.pop(0)
-               if disc_count == game.nInRow:
-                    score += 100000 # Victory
-               elif disc_count > 1:
-                    score += disc_count
-
-          for square in positions:
-               if not square is None:
-                    if square.name != player.name: # This means this subset contains an opponent disc
-                         return score
-
-          while len(positions) > 1: # The length of the list is equal to 4 now
-               positions_names = [positions[i].name if not positions[i] is None else None for i in range(len(positions))]
-               if positions_names.count(player.name) > 1:
-                    if positions_names.count(player.name) == game.nInRow:
-                         score += 100000
-                    score += positions_names.count(player.name)
-               positions.pop(0)
-          return score
-
-     def draw_moves(self, game, board=None):
-          pass
-          game.draw()
-          # test = True
-          # while test:
-          #      pygame.time.delay(1000)
-          #      for event in pygame.event.get():
-          #           if event.type == pygame.QUIT:
-          #                pygame.quit()
-          #           if event.type == pygame.KEYDOWN:
-          #                if event.key == pygame.K_p:
-          #                     test = False
+          # The scoring itself lives in evaluation.py, which does the same thing straight on the bitboards
+          evaluator = get_evaluator(position.rows, position.columns, position.nInRow)
+          return evaluator.evaluate(position.discs[side], position.discs[side ^ 1])
 
 class Random_player(Ai_player):
      def __init__(self, color, name):
           self.color = color
           self.name = name
           self.greyColor = list(map(lambda z: z//4 + 120, self.color)) # Change this for a nicer color
+          self.pool = None
      
      def turn(self, game):
-          available_rows = self.get_all_rows(game.board, self, game)
+          available_rows = [row for row in range(game.rows) if not game.getTopPos(row) < 0]
           row = random.choice(available_rows)
           column = game.getTopPos(row)
           return row, column
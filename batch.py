@@ -0,0 +1,187 @@
+"""
+Scoring a lot of positions at once, for offline work like training data and going through logged games
+
+Positions come as a stack of boards, N x rows x columns, laid out like Board.board (board[row][column],
+with column columns-1 at the bottom) and filled with 0 for empty, 1 for Player1 and 2 for Player2.
+A numpy int8 array is the natural fit, but anything numpy can turn into one works, including a
+generator of single boards: the input is read and scored chunk_size boards at a time, so memory stays
+the same no matter how many positions there are.
+
+    scores = evaluate_batch(boards, nInRow=4)            # the Ai_player.evaluate heuristic
+    values, rows = search_batch(boards, nInRow=4, depth=6, workers=8)
+
+Scores are for the player to move (Player1 if both have the same number of discs) unless side says
+otherwise: 0 for Player1, 1 for Player2, or an array with one side per board.
+
+evaluate_batch works on the whole chunk at once with numpy. Every line the heuristic looks at
+(see evaluation.py) is cut out of every board, the few different line contents in the chunk are
+found with np.unique and scored once, and the scores are added up for the lines that start on a disc.
+The results are the same as Ai_player.evaluate, for any board size.
+
+search_batch starts every board with an empty transposition table, so a board gets the same value
+and row as a fresh Ai_player would give it, whatever else is in the batch and however it is split up.
+
+This module needs numpy, nothing else in the game does.
+"""
+
+import concurrent.futures
+import itertools
+
+import numpy as np
+
+from bitboard import Position
+from evaluation import evaluate_list
+
+# Directions of the lines from evaluation.py, as (row step, column step)
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1))
+
+_geometries = {}
+_line_scores = {}
+
+def get_lines(rows, columns):
+     # For every line of length 2 or more: the flat index of every spot in it, padded with an empty spot at the end
+     if (rows, columns) not in _geometries:
+          empty = rows * columns
+          lines = []
+          for row in range(rows):
+               for column in range(columns):
+                    for rowStep, columnStep in DIRECTIONS:
+                         spots = []
+                         r, c = row, column
+                         while 0 <= r < rows and 0 <= c < columns:
+                              spots.append(r * columns + c)
+                              r += rowStep
+                              c += columnStep
+                         if len(spots) >= 2:
+                              lines.append(spots)
+          longest = max((len(spots) for spots in lines), default=1)
+          indexes = np.array([spots + [empty] * (longest - len(spots)) for spots in lines], dtype=np.intp).reshape(-1, longest)
+          lengths = np.array([len(spots) for spots in lines], dtype=np.int64)
+          _geometries[(rows, columns)] = (indexes, lengths)
+     return _geometries[(rows, columns)]
+
+def line_score(line, nInRow):
+     # The score of one line for own (1) against other (2), from its contents followed by its length
+     key = (tuple(line), nInRow)
+     if key not in _line_scores:
+          spots = [None if spot == 0 else spot - 1 for spot in line[:line[-1]]]
+          _line_scores[key] = evaluate_list(list(spots), 0, nInRow) - evaluate_list(spots, 1, nInRow)
+     return _line_scores[key]
+
+def chunks(boards, chunk_size):
+     # Yields numpy arrays of up to chunk_size boards
+     if isinstance(boards, np.ndarray):
+          for start in range(0, len(boards), chunk_size):
+               yield boards[start:start + chunk_size]
+          return
+     iterator = iter(boards)
+     while True:
+          chunk = list(itertools.islice(iterator, chunk_size))
+          if not chunk:
+               return
+          yield np.asarray(chunk, dtype=np.int8)
+
+def evaluate_chunk(boards, nInRow, side=None):
+     boards = np.asarray(boards, dtype=np.int8)
+     count, rows, columns = boards.shape
+     indexes, lengths = get_lines(rows, columns)
+
+     if side is None:
+          # The player to move, Player1 unless Player1 has played one more disc
+          side = ((boards == 1).sum(axis=(1, 2)) > (boards == 2).sum(axis=(1, 2))).astype(np.int8)
+     side = np.broadcast_to(np.asarray(side, dtype=np.int8), (count,))
+
+     # 0 for empty, 1 for the side we score for and 2 for the other one, with an extra empty spot at the end for the padding
+     flat = boards.reshape(count, -1).astype(np.int64)
+     own = np.where(flat == side[:, None] + 1, 1, 0)
+     other = np.where((flat != 0) & (own == 0), 2, 0)
+     spots = np.concatenate([own + other, np.zeros((count, 1), dtype=np.int64)], axis=1)
+
+     # Every line of every board, and how long it really is (the rest is padding)
+     contents = spots[:, indexes]
+
+     # Only lines that start on a disc count
+     starts = contents[:, :, 0] != 0
+     longest = indexes.shape[1]
+     if 3 ** longest * (longest + 1) < 2 ** 63:
+          # One int64 per line: the contents in base 3, times the longest length plus the length
+          keys = (contents * (3 ** np.arange(longest, dtype=np.int64))).sum(axis=2) * (longest + 1) + lengths
+          _, first, inverse = np.unique(keys[starts], return_index=True, return_inverse=True)
+          boards_with, lines_with = np.nonzero(starts)
+          unique_lines = np.column_stack([contents[boards_with[first], lines_with[first]], lengths[lines_with[first]]])
+     else:
+          # Lines this long would overflow that, so compare the lines themselves
+          started = np.column_stack([contents[starts], np.broadcast_to(lengths, starts.shape)[starts]])
+          unique_lines, inverse = np.unique(started, axis=0, return_inverse=True)
+     unique_scores = np.array([line_score(line, nInRow) for line in unique_lines.tolist()], dtype=np.int64)
+     line_scores = np.zeros(starts.shape, dtype=np.int64)
+     line_scores[starts] = unique_scores[inverse.reshape(-1)]
+     scores = line_scores.sum(axis=1)
+
+     # The middle rows, same as Evaluator
+     middle_rows = [rows//2, rows//2 + 1] if rows % 2 == 0 else [rows//2]
+     middle_rows = [row for row in middle_rows if row < rows]
+     middle = spots[:, :-1].reshape(count, rows, columns)[:, middle_rows, :]
+     scores += 4 * ((middle == 1).sum(axis=(1, 2)) - (middle == 2).sum(axis=(1, 2)))
+     return scores
+
+def iter_evaluate_batch(boards, nInRow=4, side=None, chunk_size=1024):
+     # Yields the heuristic scores one chunk at a time
+     start = 0
+     for chunk in chunks(boards, chunk_size):
+          chunk_side = side
+          if side is not None and np.ndim(side) > 0:
+               chunk_side = np.asarray(side)[start:start + len(chunk)]
+          yield evaluate_chunk(chunk, nInRow, chunk_side)
+          start += len(chunk)
+
+def evaluate_batch(boards, nInRow=4, side=None, chunk_size=1024):
+     # The heuristic score of every board, as one int64 array
+     scores = list(iter_evaluate_batch(boards, nInRow, side, chunk_size))
+     return np.concatenate(scores) if scores else np.zeros(0, dtype=np.int64)
+
+
+_search_players = {}
+
+def search_board(board, nInRow, settings):
+     # Runs in the worker, the player is kept for the next board
+     from algorithm import Ai_player
+     if settings not in _search_players:
+          _search_players[settings] = Ai_player((0, 0, 0), "Batch", *settings)
+     player = _search_players[settings]
+     position = Position.from_cells(board, nInRow)
+     if position.has_won(0) or position.has_won(1) or position.full():
+          return 0, -1 # The game is over, nothing to search
+     # Entries searched deeper for an earlier board would change this board's value,
+     # so every board starts with an empty table and gets the same answer in any batch
+     if player.table is not None:
+          player.table.clear()
+     return player.search(position)
+
+def iter_search_batch(boards, nInRow=4, depth=4, workers=1, chunk_size=256, **settings):
+     # Yields (values, rows) one chunk at a time, searched by Ai_player for the player to move
+     # Boards where the game is already over get the value 0 and row -1
+     settings = (depth, settings.get("alphabeta", True), settings.get("table_mb", 16))
+     executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+     try:
+          for chunk in chunks(boards, chunk_size):
+               arguments = ([board.tolist() for board in chunk], itertools.repeat(nInRow), itertools.repeat(settings))
+               if executor is None:
+                    results = list(map(search_board, *arguments))
+               else:
+                    results = list(executor.map(search_board, *arguments, chunksize=max(1, len(chunk) // (4 * workers))))
+               yield np.array([value for value, _ in results], dtype=np.int64), np.array([row for _, row in results], dtype=np.int64)
+     finally:
+          if executor is not None:
+               executor.shutdown()
+
+def search_batch(boards, nInRow=4, depth=4, workers=1, chunk_size=256, **settings):
+     # The searched value and best row of every board, as two int64 arrays
+     values = []
+     rows = []
+     for chunk_values, chunk_rows in iter_search_batch(boards, nInRow, depth, workers, chunk_size, **settings):
+          values.append(chunk_values)
+          rows.append(chunk_rows)
+     if not values:
+          return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+     return np.concatenate(values), np.concatenate(rows)
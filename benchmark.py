@@ -0,0 +1,157 @@
+"""
+Search benchmarks on a fixed set of positions
+
+Every search setting (written like the tournament players, "ai:depth=6" and so on) is run on every
+position below. For each one we measure:
+  - the move and value it picked
+  - nodes searched and nodes/second
+  - time to finish every depth from 1 and up (searched one depth after the other, like iterative deepening)
+  - peak memory of the search (a separate run with tracemalloc, so it doesn't slow down the timed run),
+    without the empty transposition table, which is the same size for every search
+
+The results are written as JSON. Save one run as the baseline, and later runs can be compared to it:
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json --max-slowdown 0.25
+The comparison fails (exit code 1) if anything got more than max-slowdown slower, or picked another move.
+"""
+
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from bitboard import Position
+from tournament import make_player
+
+# Rows played from the empty board, with Player1 starting
+POSITIONS = [
+     {"name": "opening-empty", "rows": 7, "columns": 6, "nInRow": 4, "moves": []},
+     {"name": "opening-3", "rows": 7, "columns": 6, "nInRow": 4, "moves": [3, 3, 2]},
+     {"name": "midgame", "rows": 7, "columns": 6, "nInRow": 4, "moves": [3, 3, 2, 4, 4, 2, 3, 5, 1, 1, 5, 2]},
+     {"name": "near-endgame", "rows": 7, "columns": 6, "nInRow": 4,
+      "moves": [3, 4, 2, 2, 1, 1, 6, 0, 2, 4, 3, 4, 0, 2, 4, 4, 5, 0, 5, 3, 1, 5, 3, 5, 3, 1, 1, 1, 0, 0]},
+     {"name": "small-3inrow", "rows": 5, "columns": 4, "nInRow": 3, "moves": [2, 1]},
+     {"name": "wide-5inrow", "rows": 9, "columns": 7, "nInRow": 5, "moves": [4, 4, 3, 5]},
+     {"name": "big-4inrow", "rows": 10, "columns": 8, "nInRow": 4, "moves": [5, 4, 5]},
+]
+
+CONFIGS = ["ai:depth=6", "ai:depth=6:table=0", "ai:depth=6:sym=1", "ai:depth=4:alphabeta=0"]
+
+def make_position(spec):
+     position = Position(spec["rows"], spec["columns"], spec["nInRow"])
+     for row in spec["moves"]:
+          position.play(row)
+     return position
+
+def measure(config, spec, repeat=1):
+     # Time the search to every depth with a fresh player, best of repeat runs
+     best = None
+     for _ in range(repeat):
+          player = make_player(config, (0, 0, 0))
+          # A time limited search deepens by itself, so it is only timed as a whole
+          depths = [player.depth] if player.time_limit_ms or player.depth is None else range(1, player.depth + 1)
+          depth_seconds = []
+          nodes = 0
+          start = time.perf_counter()
+          for depth in depths:
+               player.depth = depth
+               value, row = player.search(make_position(spec))
+               nodes += player.nodes
+               depth_seconds.append(time.perf_counter() - start)
+          player.close()
+          if best is None or depth_seconds[-1] < best["seconds"]:
+               best = {"move": row, "value": value, "nodes": nodes, "seconds": depth_seconds[-1], "depth_seconds": depth_seconds}
+
+     # The same search again just for the memory
+     # The transposition table is cleared (and so allocated again) when a search first sets it up for a board,
+     # that is done before tracing so only what the search itself uses is counted
+     player = make_player(config, (0, 0, 0))
+     position = make_position(spec)
+     if player.alphabeta:
+          player.side = position.turn
+          player.prepare_alphabeta(position, max(1, player.depth or 1))
+     tracemalloc.start()
+     player.search(position)
+     best["peak_memory"] = tracemalloc.get_traced_memory()[1]
+     tracemalloc.stop()
+     player.close()
+
+     best["nodes_per_second"] = best["nodes"] / best["seconds"] if best["seconds"] else 0
+     return best
+
+def run(configs=CONFIGS, positions=POSITIONS, repeat=3):
+     # A short search on every position first, so the one-time tables for each board size aren't timed
+     for spec in positions:
+          make_player("ai:depth=2:table=0", (0, 0, 0)).search(make_position(spec))
+
+     results = []
+     for config in configs:
+          for spec in positions:
+               result = {"config": config, "position": spec["name"]}
+               result.update(measure(config, spec, repeat))
+               results.append(result)
+     return {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+
+def compare(report, baseline, max_slowdown):
+     # Returns a list of problems, empty if this run is as good as the baseline
+     problems = []
+     old_results = {(result["config"], result["position"]): result for result in baseline["results"]}
+     for result in report["results"]:
+          old = old_results.get((result["config"], result["position"]))
+          if old is None:
+               continue
+          name = f"{result['config']} on {result['position']}"
+          if result["move"] != old["move"]:
+               problems.append(f"{name}: picked row {result['move']}, the baseline picked {old['move']}")
+          if result["seconds"] > old["seconds"] * (1 + max_slowdown):
+               problems.append(f"{name}: {result['seconds']:.3f}s, the baseline took {old['seconds']:.3f}s")
+     return problems
+
+def print_report(report, baseline=None):
+     old_results = {}
+     if baseline is not None:
+          old_results = {(result["config"], result["position"]): result for result in baseline["results"]}
+     print(f"{'config':<24} {'position':<16} {'move':>4} {'nodes':>9} {'seconds':>8} {'nodes/s':>9} {'memory':>9} {'change':>8}")
+     for result in report["results"]:
+          old = old_results.get((result["config"], result["position"]))
+          change = f"{result['seconds'] / old['seconds'] - 1:+.0%}" if old and old["seconds"] else ""
+          print(f"{result['config']:<24} {result['position']:<16} {result['move']:>4} {result['nodes']:>9} {result['seconds']:>8.3f} {result['nodes_per_second']:>9.0f} {result['peak_memory'] // 1024:>8}K {change:>8}")
+
+
+if __name__ == "__main__":
+     import argparse
+
+     parser = argparse.ArgumentParser(description="Benchmark the search on a fixed set of positions")
+     parser.add_argument("--config", action="append", help="Search settings like ai:depth=6 or ai:time=200, see tournament.py (can be given many times)")
+     parser.add_argument("--position", action="append", help="Only run these positions, by name")
+     parser.add_argument("--repeat", type=int, default=3, help="Keep the fastest of this many runs")
+     parser.add_argument("--output", help="Write the results as JSON to this file")
+     parser.add_argument("--save", help="Same as --output, for saving a baseline")
+     parser.add_argument("--compare", help="Baseline JSON to compare against")
+     parser.add_argument("--max-slowdown", type=float, default=0.25, help="Allowed slowdown against the baseline, 0.25 is 25%%")
+     arguments = parser.parse_args()
+
+     positions = POSITIONS
+     if arguments.position:
+          positions = [spec for spec in POSITIONS if spec["name"] in arguments.position]
+     report = run(arguments.config or CONFIGS, positions, arguments.repeat)
+
+     baseline = None
+     if arguments.compare:
+          with open(arguments.compare) as file:
+               baseline = json.load(file)
+     print_report(report, baseline)
+
+     for output in (arguments.output, arguments.save):
+          if output:
+               with open(output, "w") as file:
+                    json.dump(report, file, indent=1)
+
+     if baseline is not None:
+          problems = compare(report, baseline, arguments.max_slowdown)
+          for problem in problems:
+               print(problem)
+          if problems:
+               sys.exit(1)
+          print("No regressions against the baseline")
@@ -0,0 +1,253 @@
+"""
+A compact position for the search, so it doesn't have to poke around in Board.board
+
+Same naming as the Board: a "row" is one of the slots you drop a disc into, and a "column" is the
+height inside that slot (column 0 is the top, column columns-1 is the bottom where discs land first)
+
+Each player's discs are packed into one integer. Every row gets columns+1 bits, counted from the
+bottom and up, and the extra bit on top is always empty. That empty bit is what stops a shift from
+wrapping around from the top of one row into the bottom of the next one, so the win check can just
+shift the whole board in each direction and "and" it with itself nInRow-1 times.
+
+    bit index = row * (columns + 1) + height   (height = discs below this spot)
+
+The position also keeps a Zobrist hash that is updated on every play/undo, for the transposition table.
+Next to it is mirror_hash, the hash the mirror image (the board flipped left to right) would have.
+A position and its mirror are the same game, so min(hash, mirror_hash) is a key they share.
+"""
+
+import random
+
+_zobrist_cache = {}
+
+def zobrist_keys(rows, columns):
+     # One random 64 bit key per player and bit, plus one for the player to move
+     # The seed only depends on the geometry, so the hashes are the same in every process and every run
+     if (rows, columns) not in _zobrist_cache:
+          generator = random.Random(f"zobrist {rows}x{columns}")
+          size = rows * (columns + 1)
+          keys = [[generator.getrandbits(64) for _ in range(size)] for _ in range(2)]
+          _zobrist_cache[(rows, columns)] = (keys, generator.getrandbits(64))
+     return _zobrist_cache[(rows, columns)]
+
+_mirror_cache = {}
+
+def mirror_keys(rows, columns):
+     # The key of the spot in the mirrored row, for every bit, so mirror_hash is as cheap to update as hash
+     if (rows, columns) not in _mirror_cache:
+          keys = zobrist_keys(rows, columns)[0]
+          height = columns + 1
+          _mirror_cache[(rows, columns)] = [[side_keys[(rows - 1 - index // height) * height + index % height] for index in range(len(side_keys))]
+                                           for side_keys in keys]
+     return _mirror_cache[(rows, columns)]
+
+
+class Position():
+     def __init__(self, rows, columns, nInRow=4):
+          self.rows = rows
+          self.columns = columns
+          self.nInRow = nInRow
+          self.height = columns + 1 # Bits per row, with the sentinel on top
+
+          self.discs = [0, 0] # One integer per player, Player1 is index 0
+          self.heights = [0] * rows
+          self.turn = 0 # Index of the player to move
+          self.moves = 0
+          self.history = []
+          self.keys, self.turn_key = zobrist_keys(rows, columns)
+          self.mirror_keys = mirror_keys(rows, columns)
+          self.hash = 0
+          self.mirror_hash = 0
+
+          # Vertical, horizontal and the two diagonals
+          self.shifts = (1, self.height, self.height - 1, self.height + 1)
+          self.bottom_mask = sum(1 << (row * self.height) for row in range(rows))
+          self.board_mask = self.bottom_mask * ((1 << columns) - 1)
+
+     def __getstate__(self):
+          # The Zobrist keys are the same for every position of this size, no need to send them to other processes
+          state = self.__dict__.copy()
+          del state["keys"]
+          del state["turn_key"]
+          del state["mirror_keys"]
+          return state
+
+     def __setstate__(self, state):
+          self.__dict__.update(state)
+          self.keys, self.turn_key = zobrist_keys(self.rows, self.columns)
+          self.mirror_keys = mirror_keys(self.rows, self.columns)
+
+     def copy(self):
+          position = Position(self.rows, self.columns, self.nInRow)
+          position.discs = list(self.discs)
+          position.heights = list(self.heights)
+          position.turn = self.turn
+          position.moves = self.moves
+          position.history = list(self.history)
+          position.hash = self.hash
+          position.mirror_hash = self.mirror_hash
+          return position
+
+     def bit(self, row, height):
+          return 1 << (row * self.height + height)
+
+     def can_play(self, row):
+          return 0 <= row < self.rows and self.heights[row] < self.columns
+
+     def legal_rows(self):
+          return [row for row in range(self.rows) if self.heights[row] < self.columns]
+
+     def play(self, row):
+          index = row * self.height + self.heights[row]
+          self.discs[self.turn] |= 1 << index
+          self.hash ^= self.keys[self.turn][index] ^ self.turn_key
+          self.mirror_hash ^= self.mirror_keys[self.turn][index] ^ self.turn_key
+          self.heights[row] += 1
+          self.moves += 1
+          self.history.append(row)
+          self.turn ^= 1
+
+     def undo(self):
+          row = self.history.pop()
+          self.turn ^= 1
+          self.moves -= 1
+          self.heights[row] -= 1
+          index = row * self.height + self.heights[row]
+          self.discs[self.turn] ^= 1 << index
+          self.hash ^= self.keys[self.turn][index] ^ self.turn_key
+          self.mirror_hash ^= self.mirror_keys[self.turn][index] ^ self.turn_key
+          return row
+
+     def has_won(self, side):
+          discs = self.discs[side]
+          for shift in self.shifts:
+               line = discs
+               for step in range(1, self.nInRow):
+                    line &= discs >> (shift * step)
+                    if not line:
+                         break
+               if line:
+                    return True
+          return False
+
+     def playable_mask(self):
+          # The lowest empty spot of every row that isn't filled
+          return ((self.discs[0] | self.discs[1]) + self.bottom_mask) & self.board_mask
+
+     def winning_spots(self, side):
+          # Every empty spot that would finish nInRow for this side, playable right now or not
+          # For each direction, try every place in the line for the missing disc
+          discs = self.discs[side]
+          spots = 0
+          for shift in self.shifts:
+               for missing in range(self.nInRow):
+                    line = -1
+                    for step in range(self.nInRow):
+                         if step == missing:
+                              continue
+                         offset = (step - missing) * shift
+                         line &= discs >> offset if offset > 0 else discs << -offset
+                    spots |= line
+          return spots & self.board_mask & ~(self.discs[0] | self.discs[1])
+
+     def rows_in_mask(self, mask):
+          return [row for row in range(self.rows) if self.heights[row] < self.columns and mask & self.bit(row, self.heights[row])]
+
+     def mirror(self, bits):
+          # The same bits with the rows in the opposite order
+          row_mask = (1 << self.height) - 1
+          mirrored = 0
+          for row in range(self.rows):
+               mirrored |= ((bits >> (row * self.height)) & row_mask) << ((self.rows - 1 - row) * self.height)
+          return mirrored
+
+     def mirror_row(self, row):
+          return self.rows - 1 - row
+
+     def is_mirrored(self):
+          # True if the mirror image has the smaller key, so moves stored under the shared key are mirrored
+          return self.mirror_hash < self.hash
+
+     def canonical_hash(self):
+          return min(self.hash, self.mirror_hash)
+
+     def is_symmetric(self):
+          # True if the position is its own mirror image
+          return self.discs[0] == self.mirror(self.discs[0]) and self.discs[1] == self.mirror(self.discs[1])
+
+     def full(self):
+          return self.moves == self.rows * self.columns
+
+     def top_pos(self, row):
+          # Same answer as Board.getTopPos, -1 if the row is filled
+          return self.columns - 1 - self.heights[row]
+
+     def cell(self, row, column):
+          # Returns the index of the player in this spot, or None
+          bit = self.bit(row, self.columns - 1 - column)
+          if self.discs[0] & bit:
+               return 0
+          if self.discs[1] & bit:
+               return 1
+          return None
+
+     @classmethod
+     def from_board(cls, board, nInRow, Player1, Player2, currentPlayer=None):
+          rows = len(board)
+          columns = len(board[0])
+          position = cls(rows, columns, nInRow)
+          for row in range(rows):
+               for column in range(columns):
+                    spot = board[row][column]
+                    if spot is None:
+                         continue
+                    side = 0 if spot is Player1 else 1
+                    index = row * position.height + columns - 1 - column
+                    position.discs[side] |= 1 << index
+                    position.hash ^= position.keys[side][index]
+                    position.mirror_hash ^= position.mirror_keys[side][index]
+                    position.moves += 1
+               position.heights[row] = sum(1 for spot in board[row] if spot is not None)
+
+          if currentPlayer is None:
+               position.turn = position.moves % 2
+          else:
+               position.turn = 0 if currentPlayer is Player1 else 1
+          if position.turn:
+               position.hash ^= position.turn_key
+               position.mirror_hash ^= position.turn_key
+          return position
+
+     @classmethod
+     def from_cells(cls, cells, nInRow, turn=None):
+          # Same as from_board, but for numbers: cells[row][column] is 0 for empty, 1 for Player1 and 2 for Player2
+          rows = len(cells)
+          columns = len(cells[0])
+          position = cls(rows, columns, nInRow)
+          for row in range(rows):
+               for column in range(columns):
+                    spot = int(cells[row][column])
+                    if spot == 0:
+                         continue
+                    index = row * position.height + columns - 1 - column
+                    position.discs[spot - 1] |= 1 << index
+                    position.hash ^= position.keys[spot - 1][index]
+                    position.mirror_hash ^= position.mirror_keys[spot - 1][index]
+                    position.moves += 1
+                    position.heights[row] += 1
+
+          position.turn = position.moves % 2 if turn is None else turn
+          if position.turn:
+               position.hash ^= position.turn_key
+               position.mirror_hash ^= position.turn_key
+          return position
+
+     def to_board(self, Player1, Player2):
+          players = (Player1, Player2)
+          board = [[None for _ in range(self.columns)] for _ in range(self.rows)]
+          for row in range(self.rows):
+               for column in range(self.columns):
+                    side = self.cell(row, column)
+                    if side is not None:
+                         board[row][column] = players[side]
+          return board
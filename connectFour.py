@@ -23,8 +23,8 @@ We also need to check if the entire board is full, and therefore a draw
 I f:d up the rows and columns, so the mouse checks which row instead
 """
 
-import pygame
 import random
+import time
 
 class Player():
      def __init__(self, color, name):
@@ -34,43 +34,27 @@ class Player():
 
      def turn(self, game):
           # This function should return the position of the player's move.
-          # This should also call the games draw function with the active player
-          turn_running = True
-          while turn_running:
-               for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                         pygame.quit()
-                    if event.type == pygame.MOUSEBUTTONDOWN:
-                         row = game.getMouseRow(pygame.mouse.get_pos()[0])
-                         column = game.getTopPos(row)
-
-                         if row < 0 or row > game.rows-1 or column < 0 or column > game.columns-1:
-                              # This is out of bounds
-                              continue
-                         
-                         return (row, column)
-               
-               game.draw(active_player=self)
+          # A human needs the window to click in, so the display collects the move
+          if game.display is None:
+               raise RuntimeError(f"{self.name} is a human player and can't play on a headless board")
+          return game.display.get_move(self)
 
      
 class Board():
-     def __init__(self, rows, columns, Player1, Player2, nInRow=4, squareSize=100, squarePercentage=90, circlePercentage=80):
+     def __init__(self, rows, columns, Player1, Player2, nInRow=4, squareSize=100, squarePercentage=90, circlePercentage=80, headless=False, recorder=None, fps=60):
           self.rows = rows
           self.columns = columns
-          self.squareSize = squareSize
-          self.squarePercentage = squarePercentage / 100
-
-          self.windowSize = (squareSize*rows, squareSize*columns)
-          self.circleRadius = squareSize * circlePercentage // 200
           self.nInRow = nInRow
 
-          self.darkGrey = (100, 100, 100)
-          self.lightGrey = (150, 150, 150)
+          # Every finished game is saved with recorder.write_game(self), see gameRecord.GameWriter
+          self.recorder = recorder
 
-          pygame.init()
-          self.screen = pygame.display.set_mode(self.windowSize)
-          self.winnerFont = pygame.font.Font("freesansbold.ttf", 64)
-          self.infoFont = pygame.font.Font("freesansbold.ttf", 16)
+          # All the drawing (and pygame) is in display.py, and only loaded if we want a window
+          # A headless board plays the exact same game, just without anyone watching
+          self.display = None
+          if not headless:
+               from display import BoardDisplay
+               self.display = BoardDisplay(self, squareSize, squarePercentage, circlePercentage, fps)
           self.game_init(Player1, Player2)
 
      def game_init(self, Player1, Player2):
@@ -78,6 +62,10 @@ class Board():
           self.Player1 = Player1
           self.Player2 = Player2
           self.winner = None
+          self.moves = [] # Every (row, column) played this game, in order
+          self.move_times = [] # Seconds each of those moves took to decide
+          self.heights = [0 for _ in range(self.rows)] # Discs in every row, so we don't have to look for the top
+          self.discCount = 0 # Discs on the board, the board is full when this is rows*columns
 
      def initPlayers(self):
           self.currentPlayer = self.Player1
@@ -87,41 +75,13 @@ class Board():
           # self.otherPlayer = list(filter(lambda z: z != self.currentPlayer, [self.Player1, self.Player2]))[0]
 
      def draw(self, active_player=False):
-          self.screen.fill(self.darkGrey)
-          for row in range(self.rows):
-               for column in range(self.columns):
-                    # First we draw the squares on each spot
-                    pygame.draw.rect(self.screen, self.lightGrey, self.getBoardRect(row, column))
-                    # Now the inner dark circles
-                    if self.board[row][column] == None:
-                         pygame.draw.circle(self.screen, self.darkGrey, self.getBlockCenter(row, column), self.circleRadius)
-                    # For all spots that have some data (player), draw a circle with that player's color
-                    else:
-                         pygame.draw.circle(self.screen, self.board[row][column].color, self.getBlockCenter(row, column), self.circleRadius)
-                    
-          # Now we need to add the grey outline
-          if active_player:
-               row = self.getMouseRow(pygame.mouse.get_pos()[0])
-               if not (row < 0 or row > self.rows - 1):
-                    column = self.getTopPos(row)
-
-                    if not column < 0: # Check if this is out of bounds
-                         color = active_player.greyColor
-                         pygame.draw.circle(self.screen, color, self.getBlockCenter(row, column), self.circleRadius)
-          
-          pygame.display.update()
-                    
+          if self.display is not None:
+               self.display.draw(active_player)
 
-     def getBlockCenter(self, row, column):
-          return (row*self.squareSize + self.squareSize//2, column*self.squareSize + self.squareSize//2)
-
-     def getBoardRect(self, row, column):
-          # First, the size of the square
-          rectSize = self.squareSize * self.squarePercentage
-          # Then, calculate the center for the curent block we're in
-          blockCenter = self.getBlockCenter(row, column)
-          # Now, create the rectangel with the top-left corner
-          return pygame.Rect(blockCenter[0] - rectSize//2, blockCenter[1] - rectSize//2, rectSize, rectSize)
+     def pause(self, milliseconds):
+          # Only slow down when someone is watching
+          if self.display is not None:
+               self.display.pause(milliseconds)
 
      def alternatePlayers(self):
           placeholder = self.otherPlayer
@@ -129,66 +89,38 @@ class Board():
           self.currentPlayer = placeholder
 
      def getTopPos(self, row):
-          for i in range(self.columns):
-               column = self.columns-1 - i
-               if self.board[row][column] is None:
-                    return column
-          # If we are here, that means this entire row is filled
-          return -1
-
-     def getMouseRow(self, mousePositionX):
-          return mousePositionX // self.squareSize
-
-     def checkList(self, squareList, nInRow):
-          if len(squareList) < nInRow:
-               return False # There just is no way
-
-          for base in range(len(squareList) - nInRow + 1): # Check combination of "in a row" that does not extend beyond the list
-               if squareList[base : base + nInRow].count(self.currentPlayer) == nInRow: # Since the length of this is nInRow, taking the count is checking if everything is the player value
+          # The lowest empty spot in this row, or -1 if this entire row is filled
+          return self.columns-1 - self.heights[row]
+
+     def place(self, position):
+          # Drop the current player's disc here. Every disc should go through this so the counters stay right
+          self.board[position[0]][position[1]] = self.currentPlayer
+          self.heights[position[0]] += 1
+          self.discCount += 1
+
+     def full_board(self):
+          return self.discCount == self.rows * self.columns
+
+     def checkLine(self, position, nInRow):
+          # True if the current player has nInRow through this position (where their disc was just dropped)
+          # Start at the disc and walk both ways along the row, the column and the two diagonals
+          # counting the current player's discs until something else or the edge shows up
+          for rowStep, columnStep in ((1, 0), (0, 1), (1, 1), (1, -1)):
+               count = 1
+               for direction in (1, -1):
+                    row = position[0] + rowStep*direction
+                    column = position[1] + columnStep*direction
+                    while 0 <= row < self.rows and 0 <= column < self.columns and self.board[row][column] == self.currentPlayer:
+                         count += 1
+                         row += rowStep*direction
+                         column += columnStep*direction
+               if count >= nInRow:
                     return True
           return False
-     
-     def getDiagonal(self, position, direction):
-          change = 1 if direction == "left" else -1
-
-          baseRow = position[0]
-          baseCol = position[1]
-          while True:
-               # Go back one step left/right and up to find the base
-               if baseRow - change < 0 or baseRow - change > self.rows-1 or baseCol-1 < 0:
-                    # This is the spot. If we go further, then we're out of bounds
-                    break
-               baseRow -= change
-               baseCol -= 1
-          
-          diagonalList = []
-          while True:
-               # Now go in a diagonal as far as we can until we hit the edge
-               diagonalList.append((baseRow, baseCol))
-               baseRow += change
-               baseCol += 1
-               if baseRow < 0 or baseRow > self.rows-1 or baseCol > self.columns-1:
-                    break
-          
-          # Now we need to take this list and convert it into the data on the board
-          return list(map(lambda z: self.board[z[0]][z[1]], diagonalList))
-     
-     def full_board(self):
-          for row in range(self.rows):
-               for col in range(self.columns):
-                    if self.board[row][col] is None:
-                         return False
-          return True
 
      def checkWin(self, position, nInRow):
-          
-
-          rowList = [self.board[position[0]][column] for column in range(self.columns)]
-          columnList = [self.board[row][position[1]] for row in range(self.rows)]
-          diagonalRight = self.getDiagonal(position, "right")
-          diagonalLeft = self.getDiagonal(position, "left")
-
-          if self.checkList(rowList, nInRow) or self.checkList(columnList, nInRow) or self.checkList(diagonalRight, nInRow) or self.checkList(diagonalLeft, nInRow):
+          # True if the game is over, either by nInRow or because the board is full
+          if self.checkLine(position, nInRow):
                return True
           elif self.full_board():
                return True
@@ -197,26 +129,12 @@ class Board():
                
 
      def gameEnd(self):
-          # Do the fonts and do the player names
-          winnerText = self.winnerFont.render(f"{self.winner.name} Wins!", True, (0, 0, 0))
-          infoText = self.infoFont.render("Press BACKSPACE to quit, or press P to play again", True, (0, 0, 0))
-          self.screen.blit(winnerText, (self.windowSize[0]//2 - 200, self.windowSize[1]//2))
-          self.screen.blit(infoText, (self.windowSize[0]//2 - 200, self.windowSize[1]//2 + 100))
-
-          pygame.display.update()
-          # Now loop through the inputs until the player either quits or presses p to play again
-          end_running = True
-          while end_running:
-               for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                         end_running = False
-                    if event.type == pygame.KEYDOWN:
-                         if event.key == pygame.K_p:
-                              end_running = False
-                              self.game_init(self.Player1, self.Player2)
-                              self.play()
-                         if event.key == pygame.K_BACKSPACE:
-                              end_running = False
+          # Show the winner, and start over if the players want to play again
+          if self.display is None:
+               return
+          if self.display.game_end(self.winner):
+               self.game_init(self.Player1, self.Player2)
+               self.play()
 
      def play(self):
           game_running = True
@@ -224,22 +142,29 @@ class Board():
           self.draw()
 
           while game_running:
-               for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                         game_running = False
+               if self.display is not None and self.display.quit_requested():
+                    game_running = False
                
+               start = time.perf_counter()
                currentPlayer_move = self.currentPlayer.turn(self)
+               self.move_times.append(time.perf_counter() - start)
+               self.moves.append(currentPlayer_move)
 
-               self.board[currentPlayer_move[0]][currentPlayer_move[1]] = self.currentPlayer
+               self.place(currentPlayer_move)
                self.draw()
 
                if self.checkWin(currentPlayer_move, self.nInRow):
-                    self.winner = self.currentPlayer
+                    # A full board without nInRow is a draw, and then there is no winner
+                    self.winner = self.currentPlayer if self.checkLine(currentPlayer_move, self.nInRow) else None
                     game_running = False
+                    if self.recorder is not None:
+                         self.recorder.write_game(self)
                     self.gameEnd()
                     
                
                self.alternatePlayers()
+
+          return self.winner
                
 
 
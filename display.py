@@ -0,0 +1,174 @@
+"""
+The pygame window for a Board
+
+The Board itself doesn't know about pygame. When a window is wanted, the Board creates one of these
+and calls it whenever something should be drawn, when a human player needs to pick a move and when
+the game is over. Without it (Board(..., headless=True)) games run without pygame or a display.
+
+Drawing only touches what changed. The empty board (the squares and the empty holes) is drawn once
+onto a surface of its own, and every frame only the spots that got a disc and the hover spot are
+drawn again on top of it, and only those rectangles are sent to the screen. While a human is picking
+a move we sleep until pygame has an event for us, and redraw at most fps times a second.
+"""
+
+import pygame
+
+class BoardDisplay():
+     def __init__(self, game, squareSize=100, squarePercentage=90, circlePercentage=80, fps=60):
+          self.game = game
+          self.fps = fps
+          self.squareSize = squareSize
+          self.squarePercentage = squarePercentage / 100
+
+          self.windowSize = (squareSize*game.rows, squareSize*game.columns)
+          self.circleRadius = squareSize * circlePercentage // 200
+
+          self.darkGrey = (100, 100, 100)
+          self.lightGrey = (150, 150, 150)
+
+          pygame.init()
+          self.screen = pygame.display.set_mode(self.windowSize)
+          self.winnerFont = pygame.font.Font("freesansbold.ttf", 64)
+          self.infoFont = pygame.font.Font("freesansbold.ttf", 16)
+          self.clock = pygame.time.Clock()
+
+          self.background = self.drawBackground()
+          self.shown = {} # The color of the disc on the screen in every spot that has one
+          self.shownDiscs = 0 # game.discCount when the discs were last drawn
+          self.hover = None # (row, column, color) of the hover disc on the screen
+          self.redrawAll = True
+
+     def drawBackground(self):
+          # The board without any discs, the same for the whole game
+          background = pygame.Surface(self.windowSize).convert()
+          background.fill(self.darkGrey)
+          for row in range(self.game.rows):
+               for column in range(self.game.columns):
+                    # First we draw the squares on each spot
+                    pygame.draw.rect(background, self.lightGrey, self.getBoardRect(row, column))
+                    # Now the inner dark circles
+                    pygame.draw.circle(background, self.darkGrey, self.getBlockCenter(row, column), self.circleRadius)
+          return background
+
+     def drawSpot(self, row, column, color=None):
+          # Puts the empty spot back from the background, with a disc in it if there is a color
+          rect = self.getSquareRect(row, column)
+          self.screen.blit(self.background, rect, rect)
+          if color is not None:
+               pygame.draw.circle(self.screen, color, self.getBlockCenter(row, column), self.circleRadius)
+          return rect
+
+     def draw(self, active_player=False):
+          game = self.game
+          dirty = []
+          if self.redrawAll or game.discCount < self.shownDiscs:
+               # The first frame, or a new game: start over from the empty board
+               self.screen.blit(self.background, (0, 0))
+               self.shown = {}
+               self.shownDiscs = 0
+               self.hover = None
+               self.redrawAll = False
+               dirty.append(self.screen.get_rect())
+
+          # Take away the old hover disc, it is drawn again below if it is still there
+          hover = None
+          if active_player:
+               row = self.getMouseRow(pygame.mouse.get_pos()[0])
+               if 0 <= row < game.rows and game.getTopPos(row) >= 0:
+                    hover = (row, game.getTopPos(row), tuple(active_player.greyColor))
+          if self.hover is not None and self.hover != hover:
+               dirty.append(self.drawSpot(*self.hover[:2]))
+
+          # For all spots that have some data (player), draw a circle with that player's color
+          if game.discCount != self.shownDiscs:
+               for row in range(game.rows):
+                    for column in range(game.columns - 1, game.getTopPos(row), -1):
+                         color = game.board[row][column].color
+                         if self.shown.get((row, column)) != color:
+                              self.shown[(row, column)] = color
+                              dirty.append(self.drawSpot(row, column, color))
+               self.shownDiscs = game.discCount
+
+          # Now we need to add the grey outline
+          if hover is not None and hover != self.hover:
+               dirty.append(self.drawSpot(*hover))
+          self.hover = hover
+
+          if dirty:
+               pygame.display.update(dirty)
+
+     def getBlockCenter(self, row, column):
+          return (row*self.squareSize + self.squareSize//2, column*self.squareSize + self.squareSize//2)
+
+     def getBoardRect(self, row, column):
+          # First, the size of the square
+          rectSize = self.squareSize * self.squarePercentage
+          # Then, calculate the center for the curent block we're in
+          blockCenter = self.getBlockCenter(row, column)
+          # Now, create the rectangel with the top-left corner
+          return pygame.Rect(blockCenter[0] - rectSize//2, blockCenter[1] - rectSize//2, rectSize, rectSize)
+
+     def getSquareRect(self, row, column):
+          return pygame.Rect(row*self.squareSize, column*self.squareSize, self.squareSize, self.squareSize)
+
+     def getMouseRow(self, mousePositionX):
+          return mousePositionX // self.squareSize
+
+     def get_move(self, player):
+          # Wait for the player to click a row, and show where the disc would land in the meantime
+          # Nothing changes on the screen until something happens, so we sleep in pygame.event.wait until it does
+          game = self.game
+          self.draw(active_player=player)
+          turn_running = True
+          while turn_running:
+               for event in [pygame.event.wait()] + pygame.event.get():
+                    if event.type == pygame.QUIT:
+                         pygame.quit()
+                         raise SystemExit
+                    if event.type == pygame.MOUSEBUTTONDOWN:
+                         row = self.getMouseRow(pygame.mouse.get_pos()[0])
+                         if row < 0 or row > game.rows-1:
+                              continue
+                         column = game.getTopPos(row)
+
+                         if column < 0 or column > game.columns-1:
+                              # This is out of bounds
+                              continue
+
+                         return (row, column)
+
+               self.draw(active_player=player)
+               # However fast the mouse moves, don't redraw more than fps times a second
+               self.clock.tick(self.fps)
+
+     def quit_requested(self):
+          quit = False
+          for event in pygame.event.get():
+               if event.type == pygame.QUIT:
+                    quit = True
+          return quit
+
+     def pause(self, milliseconds):
+          # wait sleeps, delay would keep the cpu busy the whole time
+          pygame.time.wait(milliseconds)
+
+     def game_end(self, winner):
+          # Returns True if the players want to play again
+          # Do the fonts and do the player names
+          winnerText = self.winnerFont.render("Draw!" if winner is None else f"{winner.name} Wins!", True, (0, 0, 0))
+          infoText = self.infoFont.render("Press BACKSPACE to quit, or press P to play again", True, (0, 0, 0))
+          self.screen.blit(winnerText, (self.windowSize[0]//2 - 200, self.windowSize[1]//2))
+          self.screen.blit(infoText, (self.windowSize[0]//2 - 200, self.windowSize[1]//2 + 100))
+
+          pygame.display.update()
+          self.redrawAll = True # The text is on top of the board now
+          # Now wait for the inputs until the player either quits or presses p to play again
+          while True:
+               event = pygame.event.wait()
+               if event.type == pygame.QUIT:
+                    return False
+               if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_p:
+                         return True
+                    if event.key == pygame.K_BACKSPACE:
+                         return False
@@ -0,0 +1,138 @@
+"""
+Table driven version of the Ai_player.evaluate heuristic, working straight on the Position bitboards
+
+The heuristic looks at the line from every disc to the edge of the board in four directions
+(down the row, along the column and the two diagonals) and scores each line with evaluate_list.
+evaluate_list stops at the first opponent disc it finds, so a line's score isn't just a sum over its
+nInRow-long windows, but it only depends on what is in the line.
+
+So for every spot and direction we work out once per board size where the line's bits are in the
+bitboard (first bit, step between bits and length). Evaluating a position is then, for every disc,
+cutting its four lines out of the two bitboards with a shift and a mask and looking the score up.
+The first time a line content shows up it is scored with evaluate_list, so the scores are always
+exactly the same as the original nested-list version.
+"""
+
+# The line scores are forgotten after this many different line contents, so big boards can't eat all the memory
+LINE_CACHE_LIMIT = 500000
+
+_evaluators = {}
+
+def get_evaluator(rows, columns, nInRow):
+     if (rows, columns, nInRow) not in _evaluators:
+          _evaluators[(rows, columns, nInRow)] = Evaluator(rows, columns, nInRow)
+     return _evaluators[(rows, columns, nInRow)]
+
+
+class Evaluator():
+     def __init__(self, rows, columns, nInRow):
+          self.rows = rows
+          self.columns = columns
+          self.nInRow = nInRow
+          height = columns + 1
+
+          # For every bit: the lines starting in that spot as (lowest bit, mask, step, length)
+          # The directions follow the original get_row, get_column and the left and right get_diagonal
+          self.lines = {}
+          for row in range(rows):
+               for column in range(columns):
+                    start = row * height + columns - 1 - column
+                    lines = []
+                    for step, length in ((-1, columns - column),
+                                         (height, rows - row),
+                                         (height - 1, min(rows - row, columns - column)),
+                                         (-height - 1, min(row + 1, columns - column))):
+                         if length < 2:
+                              continue # evaluate_list doesn't give any points for these
+                         lowest = start if step > 0 else start + (length - 1) * step
+                         mask = sum(1 << (i * abs(step)) for i in range(length))
+                         lines.append((lowest, mask, step, length))
+                    self.lines[start] = lines
+
+          # The middle rows, same ones as the original (rows//2, and rows//2 + 1 for an even number of rows)
+          middle_rows = [rows//2, rows//2 + 1] if rows % 2 == 0 else [rows//2]
+          self.middle_mask = 0
+          for row in middle_rows:
+               if row < rows:
+                    self.middle_mask |= ((1 << columns) - 1) << (row * height)
+
+          self.line_scores = {}
+
+     def evaluate(self, own, other):
+          # own and other are the two bitboards, the score is from own's point of view
+          score = 0
+          line_scores = self.line_scores
+          occupied = own | other
+          while occupied:
+               bit = occupied & -occupied
+               occupied ^= bit
+               for lowest, mask, step, length in self.lines[bit.bit_length() - 1]:
+                    own_line = (own >> lowest) & mask
+                    other_line = (other >> lowest) & mask
+                    key = (step, length, own_line, other_line)
+                    # One get, so another thread clearing the cache in between can't make the key disappear
+                    line_score = line_scores.get(key)
+                    if line_score is None:
+                         if len(line_scores) >= LINE_CACHE_LIMIT:
+                              line_scores.clear()
+                         line_score = line_scores[key] = self.score_line(step, length, own_line, other_line)
+                    score += line_score
+
+          score += 4 * (bin(own & self.middle_mask).count("1") - bin(other & self.middle_mask).count("1"))
+          return score
+
+     def score_line(self, step, length, own_line, other_line):
+          # Turn the bits back into the list evaluate_list expects (0 for own, 1 for other, None for empty)
+          spacing = abs(step)
+          spots = []
+          for i in range(length):
+               shift = i * spacing if step > 0 else (length - 1 - i) * spacing
+               if own_line >> shift & 1:
+                    spots.append(0)
+               elif other_line >> shift & 1:
+                    spots.append(1)
+               else:
+                    spots.append(None)
+          return evaluate_list(list(spots), 0, self.nInRow) - evaluate_list(spots, 1, self.nInRow)
+
+
+def evaluate_list(positions, side, nInRow):
+     # positions holds the index of the player in each spot, or None
+     score = 0
+     if len(positions) < 2:
+          return score
+
+     # We are going to take the first nInRow spots and evaluate those
+     # When we are done evaluating, pop the first item and repeate
+     # When the gets to less than / equal to nInRow, we don't evaluate if the starting spot is the opposite player
+     while len(positions) > nInRow:
+          active_positions = positions[:nInRow]
+          disc_count = 0
+          for position in active_positions:
+               if position is None:
+                    continue
+               elif position == side:
+                    disc_count += 1
+               else: # This is the opponents piece
+                    if disc_count <= 1:
+                         disc_count = 0
+                    return score + disc_count # We stop everything and simply return the score for this list
+          # If we are here, there were no opponent discs. Count the discs and pop the list
+          positions.pop(0)
+          if disc_count == nInRow:
+               score += 100000 # Victory
+          elif disc_count > 1:
+               score += disc_count
+
+     for square in positions:
+          if not square is None:
+               if square != side: # This means this subset contains an opponent disc
+                    return score
+
+     while len(positions) > 1: # The length of the list is equal to 4 now
+          if positions.count(side) > 1:
+               if positions.count(side) == nInRow:
+                    score += 100000
+               score += positions.count(side)
+          positions.pop(0)
+     return score
@@ -0,0 +1,268 @@
+"""
+Game records: every game played, saved in a small binary file
+
+One file holds any number of games, one after the other, and new games are just appended at the end:
+    file header:  b"C4GR", version
+    game header:  rows, columns, nInRow, result, number of moves (2 bytes), length of both names
+    then the two player names (utf-8) and one byte per move, the row the disc was dropped in
+result is 0 for a game that didn't finish, 1 if Player1 won, 2 if Player2 won and 3 for a draw.
+A normal 7x6 game is less than 60 bytes, so millions of games is still a small file.
+
+Writing, for example from a Board (see Board(recorder=...)) or from the tournament (--record):
+    with GameWriter("games.c4g") as writer:
+         writer.write(7, 6, 4, [3, 3, 2, 4], ("Red Ai", "Yellow Ai"), result=0)
+
+Reading is a generator, so only one game is in memory at a time and the analysis can be chained:
+    games = read_games("games.c4g")
+    finished = (game for game in games if game.result)
+    for game, ply, position in game_positions(finished):
+         ...
+Replay steps a bitboard Position back and forth through one game, seek(ply) only plays or takes back
+the moves in between. ReplayPlayer plays a recorded game again on a Board, with or without a window.
+    python gameRecord.py summary games.c4g
+    python gameRecord.py replay games.c4g --game 12 --ply 20
+"""
+
+import struct
+
+from bitboard import Position
+from connectFour import Player
+
+MAGIC = b"C4GR"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sB")
+GAME_HEADER = struct.Struct("<BBBBHBB")
+
+UNFINISHED = 0
+PLAYER1_WON = 1
+PLAYER2_WON = 2
+DRAW = 3
+
+# Names longer than this many bytes are cut off
+NAME_LIMIT = 255
+
+
+class GameRecord():
+     def __init__(self, rows, columns, nInRow, moves, names=("", ""), result=UNFINISHED, offset=None):
+          self.rows = rows
+          self.columns = columns
+          self.nInRow = nInRow
+          self.moves = bytes(moves) # One row per move, Player1 first
+          self.names = tuple(names)
+          self.result = result
+          self.offset = offset # Where the game starts in the file it was read from
+
+     def __len__(self):
+          return len(self.moves)
+
+     def winner(self):
+          # The index of the player that won (0 for Player1), or None for a draw or an unfinished game
+          return {PLAYER1_WON: 0, PLAYER2_WON: 1}.get(self.result)
+
+     def position(self, ply=None):
+          # The position after ply moves, or at the end of the game
+          position = Position(self.rows, self.columns, self.nInRow)
+          for row in self.moves[:ply]:
+               position.play(row)
+          return position
+
+     def pack(self):
+          names = [name.encode("utf-8")[:NAME_LIMIT] for name in self.names]
+          header = GAME_HEADER.pack(self.rows, self.columns, self.nInRow, self.result, len(self.moves), len(names[0]), len(names[1]))
+          return header + names[0] + names[1] + self.moves
+
+
+class GameWriter():
+     def __init__(self, path):
+          self.path = path
+          self.file = open(path, "ab")
+          if self.file.tell() == 0:
+               self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+     def __enter__(self):
+          return self
+
+     def __exit__(self, *exception):
+          self.close()
+
+     def write(self, rows, columns, nInRow, moves, names=("", ""), result=UNFINISHED):
+          self.write_record(GameRecord(rows, columns, nInRow, moves, names, result))
+
+     def write_record(self, game):
+          self.file.write(game.pack())
+
+     def write_game(self, board):
+          # Saves the game a Board just played
+          if board.winner is None:
+               result = DRAW if board.full_board() else UNFINISHED
+          else:
+               result = PLAYER1_WON if board.winner is board.Player1 else PLAYER2_WON
+          names = (board.Player1.name, board.Player2.name)
+          self.write(board.rows, board.columns, board.nInRow, [move[0] for move in board.moves], names, result)
+          self.file.flush()
+
+     def flush(self):
+          self.file.flush()
+
+     def close(self):
+          self.file.close()
+
+
+def read_header(file, path):
+     magic, version = FILE_HEADER.unpack(file.read(FILE_HEADER.size))
+     if magic != MAGIC or version != VERSION:
+          raise ValueError(f"{path} is not a game record file")
+
+def read_game(file, offset):
+     # The game that starts at offset, or None at the end of the file
+     header = file.read(GAME_HEADER.size)
+     if len(header) < GAME_HEADER.size:
+          return None
+     rows, columns, nInRow, result, plies, first_length, second_length = GAME_HEADER.unpack(header)
+     body = file.read(first_length + second_length + plies)
+     if len(body) < first_length + second_length + plies:
+          raise ValueError(f"The game at byte {offset} is cut off")
+     names = (body[:first_length].decode("utf-8", "replace"), body[first_length:first_length + second_length].decode("utf-8", "replace"))
+     return GameRecord(rows, columns, nInRow, body[first_length + second_length:], names, result, offset)
+
+def read_games(path, start=None):
+     # Yields every game in the file, in the order they were written. start is the offset to begin at
+     with open(path, "rb") as file:
+          read_header(file, path)
+          if start is not None:
+               file.seek(start)
+          while True:
+               offset = file.tell()
+               game = read_game(file, offset)
+               if game is None:
+                    return
+               yield game
+
+def game_offsets(path):
+     # Yields where every game starts, without reading the names and moves
+     with open(path, "rb") as file:
+          read_header(file, path)
+          offset = file.tell()
+          while True:
+               header = file.read(GAME_HEADER.size)
+               if len(header) < GAME_HEADER.size:
+                    return
+               plies, first_length, second_length = GAME_HEADER.unpack(header)[4:]
+               yield offset
+               offset += GAME_HEADER.size + first_length + second_length + plies
+               file.seek(offset)
+
+def load_game(path, offset):
+     with open(path, "rb") as file:
+          file.seek(offset)
+          game = read_game(file, offset)
+     if game is None:
+          raise IndexError(f"No game at byte {offset} in {path}")
+     return game
+
+def game_positions(games, every=1):
+     # Yields (game, ply, position) for every game, every `every` plies from the start to the end
+     # The position is the same object all through one game, copy it to keep it
+     for game in games:
+          replay = Replay(game)
+          for ply in range(0, len(game) + 1, every):
+               yield game, ply, replay.seek(ply)
+
+def summarize(games):
+     # Results, game lengths and first moves for everything the generator gives us
+     summary = {"games": 0, "results": {"unfinished": 0, "player1": 0, "player2": 0, "draw": 0}, "plies": 0, "first_moves": {}}
+     names = {UNFINISHED: "unfinished", PLAYER1_WON: "player1", PLAYER2_WON: "player2", DRAW: "draw"}
+     for game in games:
+          summary["games"] += 1
+          summary["results"][names.get(game.result, "unfinished")] += 1
+          summary["plies"] += len(game)
+          if game.moves:
+               first = summary["first_moves"].setdefault(game.moves[0], {"games": 0, "player1": 0})
+               first["games"] += 1
+               first["player1"] += game.result == PLAYER1_WON
+     summary["average_plies"] = summary["plies"] / summary["games"] if summary["games"] else 0
+     return summary
+
+
+class Replay():
+     # One game, positioned at any ply
+     def __init__(self, game):
+          self.game = game
+          self.position = Position(game.rows, game.columns, game.nInRow)
+          self.ply = 0
+
+     def seek(self, ply):
+          if not 0 <= ply <= len(self.game):
+               raise IndexError(f"The game has {len(self.game)} moves, can't go to ply {ply}")
+          while self.ply < ply:
+               self.position.play(self.game.moves[self.ply])
+               self.ply += 1
+          while self.ply > ply:
+               self.position.undo()
+               self.ply -= 1
+          return self.position
+
+     def forward(self):
+          return self.seek(self.ply + 1)
+
+     def back(self):
+          return self.seek(self.ply - 1)
+
+
+class ReplayPlayer(Player):
+     # Plays the moves one side made in a recorded game, so the game can be watched again on a Board
+     def __init__(self, color, game, side, delay=500):
+          super().__init__(color, game.names[side] or f"Player{side + 1}")
+          self.moves = game.moves[side::2]
+          self.delay = delay
+
+     def turn(self, game):
+          # Counted from the board, so playing again from the start works too
+          played = len(game.moves) // 2
+          if played >= len(self.moves):
+               raise RuntimeError("The recorded game ends here")
+          row = self.moves[played]
+          game.pause(self.delay)
+          return row, game.getTopPos(row)
+
+
+def print_position(position):
+     # The board as text, the top of every row on the left
+     symbols = {None: ".", 0: "X", 1: "O"}
+     for row in range(position.rows):
+          print(" ".join(symbols[position.cell(row, column)] for column in range(position.columns)))
+
+
+if __name__ == "__main__":
+     import argparse
+     import itertools
+
+     parser = argparse.ArgumentParser(description="Look through recorded games")
+     parser.add_argument("command", choices=["summary", "replay"])
+     parser.add_argument("path")
+     parser.add_argument("--game", type=int, default=0, help="Which game to replay, counted from 0")
+     parser.add_argument("--ply", type=int, default=None, help="Show the position after this many moves")
+     parser.add_argument("--watch", action="store_true", help="Play the game again in a window")
+     arguments = parser.parse_args()
+
+     if arguments.command == "summary":
+          summary = summarize(read_games(arguments.path))
+          print(f"{summary['games']} games, {summary['average_plies']:.1f} moves on average")
+          for result, count in summary["results"].items():
+               print(f"  {result:<11} {count}")
+          for row, first in sorted(summary["first_moves"].items()):
+               print(f"  first move {row}: {first['games']} games, Player1 won {first['player1'] / first['games']:.0%}")
+     else:
+          offset = next(itertools.islice(game_offsets(arguments.path), arguments.game, None), None)
+          if offset is None:
+               raise SystemExit(f"There is no game {arguments.game} in {arguments.path}")
+          game = load_game(arguments.path, offset)
+          if arguments.watch:
+               from connectFour import Board
+               Player1 = ReplayPlayer((255, 0, 0), game, 0)
+               Player2 = ReplayPlayer((255, 255, 0), game, 1)
+               Board(game.rows, game.columns, Player1, Player2, nInRow=game.nInRow, squareSize=120, squarePercentage=95).play()
+          else:
+               ply = len(game) if arguments.ply is None else arguments.ply
+               print(f"{game.names[0]} against {game.names[1]}, ply {ply} of {len(game)}")
+               print_position(Replay(game).seek(ply))
@@ -0,0 +1,131 @@
+"""
+Seeing what the search did for a move
+
+Give Ai_player an on_search callback and it gets called once per move with a dict like
+     {"event": "search", "player": "Red Ai", "source": "search", "move": 3, "value": 12,
+      "seconds": 0.41, "nodes": 10412, "leaves": 6120, "cutoffs": 1733, "table_hits": 2110,
+      "max_depth": 6, "completed_depth": 6, "branching_factor": 4.7, "evaluation_seconds": 0.12,
+      "move_generation_seconds": 0.08, "principal_variation": [3, 3, 2, 4, 4, 2],
+      "iterations": [...]}
+source is "book", "solver", "parallel" or "search", and the counters only make sense for "search".
+iterations has (depth, nodes, seconds, move) for every finished depth when there is a time limit.
+
+Without a callback nothing changes in the search at all. With one, evaluate, order_moves,
+get_all_rows and store_cutoff are swapped out on that player for versions that count and time
+themselves, for as long as the move takes, and put back afterwards.
+
+    player = Ai_player(color, name, 6, on_search=JsonlEventWriter("search.jsonl"))
+    player = Ai_player(color, name, 6, on_search=events.append)
+"""
+
+import json
+import time
+
+
+class SearchInstrument():
+     def __init__(self, player, position):
+          self.player = player
+          self.root_moves = position.moves
+          self.leaves = 0
+          self.cutoffs = 0
+          self.max_depth = 0
+          self.interior_nodes = 0
+          self.moves_generated = 0
+          self.evaluation_seconds = 0
+          self.move_generation_seconds = 0
+          self.table_hits = player.table.hits if player.table is not None else 0
+
+     def attach(self):
+          player = self.player
+          evaluate = player.evaluate
+          order_moves = player.order_moves
+          get_all_rows = player.get_all_rows
+          store_cutoff = player.store_cutoff
+
+          def timed_evaluate(position, side):
+               start = time.perf_counter()
+               score = evaluate(position, side)
+               self.evaluation_seconds += time.perf_counter() - start
+               self.leaves += 1
+               self.max_depth = max(self.max_depth, position.moves - self.root_moves)
+               return score
+
+          def timed_order_moves(*arguments):
+               start = time.perf_counter()
+               rows = order_moves(*arguments)
+               self.move_generation_seconds += time.perf_counter() - start
+               self.interior_nodes += 1
+               self.moves_generated += len(rows)
+               return rows
+
+          def timed_get_all_rows(position):
+               start = time.perf_counter()
+               rows = get_all_rows(position)
+               self.move_generation_seconds += time.perf_counter() - start
+               self.interior_nodes += 1
+               self.moves_generated += len(rows)
+               return rows
+
+          def counted_store_cutoff(*arguments):
+               self.cutoffs += 1
+               return store_cutoff(*arguments)
+
+          player.evaluate = timed_evaluate
+          player.order_moves = timed_order_moves
+          player.get_all_rows = timed_get_all_rows
+          player.store_cutoff = counted_store_cutoff
+
+     def detach(self):
+          for name in ("evaluate", "order_moves", "get_all_rows", "store_cutoff"):
+               self.player.__dict__.pop(name, None)
+
+     def principal_variation(self, position, row):
+          # The best move, then the best moves the transposition table remembers after it
+          moves = []
+          if row is None:
+               return moves
+          player = self.player
+          position = position.copy()
+          while row is not None and position.can_play(row) and len(moves) < max(1, player.completed_depth):
+               moves.append(row)
+               position.play(row)
+               if player.table is None or position.has_won(0) or position.has_won(1):
+                    break
+               row = player.table_move(position)
+          return moves
+
+     def event(self, position, value, row, seconds):
+          player = self.player
+          table_hits = player.table.hits - self.table_hits if player.table is not None else 0
+          depth = max(1, player.completed_depth)
+          return {
+               "event": "search",
+               "player": player.name,
+               "source": player.source,
+               "move": row,
+               "value": value,
+               "seconds": seconds,
+               "nodes": player.nodes,
+               "leaves": self.leaves,
+               "cutoffs": self.cutoffs,
+               "table_hits": table_hits,
+               "max_depth": self.max_depth,
+               "completed_depth": player.completed_depth,
+               # How many moves each node would need for the same number of nodes in a full tree
+               "branching_factor": player.nodes ** (1 / depth) if player.nodes else 0,
+               "moves_per_node": self.moves_generated / self.interior_nodes if self.interior_nodes else 0,
+               "evaluation_seconds": self.evaluation_seconds,
+               "move_generation_seconds": self.move_generation_seconds,
+               "principal_variation": self.principal_variation(position, row),
+               "iterations": list(player.iterations),
+          }
+
+
+class JsonlEventWriter():
+     # A callback for on_search that writes every event as a line of JSON
+     def __init__(self, path):
+          self.path = path
+
+     def __call__(self, event):
+          with open(self.path, "a") as file:
+               file.write(json.dumps(event) + "\n")
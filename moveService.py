@@ -0,0 +1,353 @@
+"""
+Move service: one engine process answering move requests for many games at once
+
+The service listens on a socket and talks in lines of JSON. A request is a position and a time budget:
+    {"id": 1, "rows": 7, "columns": 6, "nInRow": 4, "moves": [3, 3, 2], "time_ms": 200}
+moves are the rows played from the empty board, Player1 first. Instead of moves, "cells" can be the
+whole board like Position.from_cells takes it, with "turn" (0 or 1) if it can't be worked out from the
+disc count. "depth" limits the search depth, and without "time_ms" the service's default time is used.
+Every request gets one answer with the same id, as soon as its search is done (so not always in order):
+    {"id": 1, "row": 4, "value": -11, "depth": 9, "nodes": 20113, "source": "search", "seconds": 0.2}
+    {"id": 2, "error": "row 3 is full"}
+{"cancel": 1} stops the search for request 1 on this connection, and it is answered with "cancelled".
+When a client disconnects, all of its searches are stopped.
+
+The searches run on a thread pool, one Ai_player per thread, so the event loop keeps answering while
+they run. Threads share memory, which is the point here: every search with the same board and side
+uses the same transposition table, so one game's search helps the next game's, and every thread
+reads the same opening book. The table has no lock: two threads storing into the same bucket at once
+can lose one of the entries and its counters (hits, stores and so on) can miss a few, which costs a
+little search but never gives a wrong entry, since every entry is checked against the full key. (Python runs only one search at a time on the CPU, so more workers help
+with many short requests, not with a faster single search. For that, see parallel.py.)
+
+    python moveService.py --port 8765 --workers 4 --book book.bin
+
+MoveClient is a small asyncio client for it:
+    client = await MoveClient.connect("127.0.0.1", 8765)
+    reply = await client.request_move(7, 6, 4, [3, 3, 2], time_ms=200)
+"""
+
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import threading
+import time
+
+from algorithm import Ai_player, SearchTimeout, CLOCK_CHECK_NODES
+from bitboard import Position
+from openingBook import OpeningBook
+from transposition import TranspositionTable
+
+DEFAULT_TIME_MS = 1000
+
+# Biggest board the service takes, the same limit as the one byte sizes in the book and game records
+BOARD_LIMIT = 255
+
+
+class BadRequest(Exception):
+     # The request can't be answered with a move, the message goes back to the client
+     pass
+
+
+class ServicePlayer(Ai_player):
+     # An Ai_player that can be stopped from another thread
+     def __init__(self, depth=None, table_mb=0, book=None):
+          super().__init__((0, 0, 0), "Service", depth, table_mb=table_mb, book=book)
+          self.cancelled = threading.Event()
+
+     def check_time(self):
+          if self.nodes % CLOCK_CHECK_NODES == 0 and self.cancelled.is_set():
+               raise SearchTimeout()
+          super().check_time()
+
+
+class MoveService():
+     def __init__(self, workers=4, table_mb=64, book=None, default_time_ms=DEFAULT_TIME_MS):
+          self.workers = workers
+          self.table_mb = table_mb
+          self.default_time_ms = default_time_ms
+          self.book = OpeningBook(book) if isinstance(book, str) else book
+          if self.book is not None:
+               self.book.open() # Before any thread uses it
+
+          # One transposition table per side and board, shared by every search on it (see Ai_player.prepare_alphabeta)
+          self.tables = {}
+          self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+          self.players = None
+          self.server = None
+          self.requests = 0
+
+     async def start(self, host="127.0.0.1", port=0):
+          # Port 0 picks a free port, see self.port
+          self.players = asyncio.Queue()
+          for _ in range(self.workers):
+               self.players.put_nowait(ServicePlayer(book=self.book))
+          self.server = await asyncio.start_server(self.handle_client, host, port)
+          self.port = self.server.sockets[0].getsockname()[1]
+          return self.server
+
+     async def serve_forever(self):
+          async with self.server:
+               await self.server.serve_forever()
+
+     async def close(self):
+          if self.server is not None:
+               self.server.close()
+               await self.server.wait_closed()
+          self.executor.shutdown(cancel_futures=True)
+
+     def get_table(self, position):
+          if not self.table_mb:
+               return None
+          context = (position.turn, position.rows, position.columns, position.nInRow)
+          if context not in self.tables:
+               self.tables[context] = TranspositionTable(self.table_mb)
+          return self.tables[context]
+
+     async def handle_client(self, reader, writer):
+          searches = {}
+          lock = asyncio.Lock()
+
+          async def send(reply):
+               async with lock:
+                    writer.write((json.dumps(reply) + "\n").encode())
+                    await writer.drain()
+
+          async def answer(request):
+               try:
+                    try:
+                         reply = await self.move(request)
+                    except asyncio.CancelledError:
+                         if reader.at_eof():
+                              return
+                         reply = {"id": request["id"], "error": "cancelled"}
+                    except Exception as error:
+                         # Whatever went wrong, the client still gets an answer instead of waiting forever
+                         reply = {"id": request["id"], "error": f"the search failed: {error!r}"}
+                    await send(reply)
+               except ConnectionError:
+                    pass
+               finally:
+                    searches.pop(request["id"], None)
+
+          try:
+               while True:
+                    line = await reader.readline()
+                    if not line:
+                         break
+                    try:
+                         request = json.loads(line)
+                    except ValueError:
+                         await send({"id": None, "error": "not JSON"})
+                         continue
+                    if not isinstance(request, dict):
+                         await send({"id": None, "error": "a request must be a JSON object"})
+                         continue
+                    if "cancel" in request:
+                         if is_id(request["cancel"]):
+                              search = searches.get(request["cancel"])
+                              if search is not None:
+                                   search.cancel()
+                         continue
+                    request.setdefault("id", None)
+                    if not is_id(request["id"]):
+                         await send({"id": None, "error": "id must be a number, a string or null"})
+                         continue
+                    if request["id"] in searches:
+                         await send({"id": request["id"], "error": "a request with this id is already running"})
+                         continue
+                    searches[request["id"]] = asyncio.create_task(answer(request))
+          except ConnectionError:
+               pass
+          finally:
+               # The client is gone, nobody wants these moves anymore
+               for search in list(searches.values()):
+                    search.cancel()
+               await asyncio.gather(*searches.values(), return_exceptions=True)
+               writer.close()
+
+     async def move(self, request):
+          # The reply for one request. Cancelling this stops the search
+          self.requests += 1
+          try:
+               position = self.make_position(request)
+               time_ms = request.get("time_ms", self.default_time_ms)
+               depth = request.get("depth")
+               if time_ms is not None and (not is_number(time_ms) or time_ms <= 0):
+                    raise BadRequest("time_ms must be a positive number")
+               if depth is not None and (not is_integer(depth) or depth < 1):
+                    raise BadRequest("depth must be a positive integer")
+               if time_ms is None and depth is None:
+                    raise BadRequest("a request needs time_ms or depth")
+          except BadRequest as error:
+               return {"id": request["id"], "error": str(error)}
+          if position.has_won(0) or position.has_won(1) or position.full():
+               return {"id": request["id"], "error": "the game is already over"}
+
+          player = await self.players.get()
+          player.cancelled.clear()
+          loop = asyncio.get_running_loop()
+          search = loop.run_in_executor(self.executor, self.search, player, position, time_ms, depth, self.get_table(position))
+          # The player goes back when its thread is really done, however this coroutine ends
+          search.add_done_callback(lambda _: self.players.put_nowait(player))
+          try:
+               reply = await asyncio.shield(search)
+          except asyncio.CancelledError:
+               # The thread can't be killed, but it stops at its next look at the clock
+               player.cancelled.set()
+               raise
+          reply["id"] = request["id"]
+          return reply
+
+     def make_position(self, request):
+          # Raises BadRequest for anything that isn't a legal position
+          nInRow = request.get("nInRow", 4)
+          if not is_integer(nInRow) or nInRow < 1:
+               raise BadRequest("nInRow must be a positive integer")
+          if "cells" in request:
+               return self.position_from_cells(request, nInRow)
+
+          rows = request.get("rows")
+          columns = request.get("columns")
+          if not is_integer(rows) or not is_integer(columns) or not 1 <= rows <= BOARD_LIMIT or not 1 <= columns <= BOARD_LIMIT:
+               raise BadRequest(f"rows and columns must be integers from 1 to {BOARD_LIMIT}")
+          moves = request.get("moves", [])
+          if not isinstance(moves, list):
+               raise BadRequest("moves must be a list of rows")
+          position = Position(rows, columns, nInRow)
+          for row in moves:
+               if not is_integer(row) or not position.can_play(row):
+                    raise BadRequest(f"row {row!r} can't be played")
+               position.play(row)
+          return position
+
+     def position_from_cells(self, request, nInRow):
+          cells = request["cells"]
+          if not isinstance(cells, list) or not cells or not all(isinstance(row, list) for row in cells):
+               raise BadRequest("cells must be a list of rows")
+          columns = len(cells[0])
+          if not 1 <= len(cells) <= BOARD_LIMIT or not 1 <= columns <= BOARD_LIMIT or any(len(row) != columns for row in cells):
+               raise BadRequest(f"cells must have 1 to {BOARD_LIMIT} rows, all of the same length from 1 to {BOARD_LIMIT}")
+          if (len(cells), columns) != (request.get("rows", len(cells)), request.get("columns", columns)):
+               raise BadRequest("cells doesn't match rows and columns")
+          for row in cells:
+               if any(not is_integer(spot) or spot not in (0, 1, 2) for spot in row):
+                    raise BadRequest("cells can only hold 0, 1 and 2")
+               # The bottom is the last column, discs can't float above an empty spot
+               discs = sum(1 for spot in row if spot)
+               if any(row[columns - 1 - height] == 0 for height in range(discs)):
+                    raise BadRequest("cells has a disc above an empty spot")
+          turn = request.get("turn")
+          if turn not in (None, 0, 1) or isinstance(turn, bool):
+               raise BadRequest("turn must be 0, 1 or null")
+          return Position.from_cells(cells, nInRow, turn)
+
+     def search(self, player, position, time_ms, depth, table):
+          # Runs on a worker thread
+          player.depth = depth
+          player.time_limit_ms = time_ms
+          player.table = table
+          player.table_context = (position.turn, position.rows, position.columns, position.nInRow)
+          start = time.perf_counter()
+          try:
+               result = player.search(position)
+          except SearchTimeout:
+               result = None
+          if result is None or player.cancelled.is_set():
+               return {"error": "cancelled"}
+          value, row = result
+          return {"row": row, "value": value, "depth": player.completed_depth, "nodes": player.nodes,
+                  "source": player.source, "seconds": time.perf_counter() - start}
+
+
+def is_integer(value):
+     # JSON true and false come back as bools, which Python also counts as ints
+     return isinstance(value, int) and not isinstance(value, bool)
+
+def is_number(value):
+     return is_integer(value) or isinstance(value, float)
+
+def is_id(value):
+     return value is None or is_number(value) or isinstance(value, str)
+
+
+class MoveClient():
+     def __init__(self, reader, writer):
+          self.reader = reader
+          self.writer = writer
+          self.ids = itertools.count()
+          self.waiting = {}
+          self.listener = asyncio.create_task(self.listen())
+
+     @classmethod
+     async def connect(cls, host="127.0.0.1", port=8765):
+          reader, writer = await asyncio.open_connection(host, port)
+          return cls(reader, writer)
+
+     async def listen(self):
+          try:
+               while True:
+                    line = await self.reader.readline()
+                    if not line:
+                         break
+                    reply = json.loads(line)
+                    future = self.waiting.pop(reply.get("id"), None)
+                    if future is not None and not future.done():
+                         future.set_result(reply)
+          finally:
+               for future in self.waiting.values():
+                    if not future.done():
+                         future.set_exception(ConnectionError("The move service closed the connection"))
+
+     async def send(self, message):
+          self.writer.write((json.dumps(message) + "\n").encode())
+          await self.writer.drain()
+
+     async def request(self, **request):
+          # Sends the request and waits for its reply. Cancelling this cancels the search too
+          request["id"] = next(self.ids)
+          future = asyncio.get_running_loop().create_future()
+          self.waiting[request["id"]] = future
+          await self.send(request)
+          try:
+               return await future
+          except asyncio.CancelledError:
+               self.waiting.pop(request["id"], None)
+               if not self.writer.is_closing():
+                    await self.send({"cancel": request["id"]})
+               raise
+
+     async def request_move(self, rows, columns, nInRow, moves, time_ms=None, depth=None):
+          request = {"rows": rows, "columns": columns, "nInRow": nInRow, "moves": list(moves)}
+          if time_ms is not None:
+               request["time_ms"] = time_ms
+          if depth is not None:
+               request["depth"] = depth
+          return await self.request(**request)
+
+     async def close(self):
+          self.writer.close()
+          await self.writer.wait_closed()
+          self.listener.cancel()
+
+
+if __name__ == "__main__":
+     import argparse
+
+     parser = argparse.ArgumentParser(description="Serve ai moves over a socket")
+     parser.add_argument("--host", default="127.0.0.1")
+     parser.add_argument("--port", type=int, default=8765)
+     parser.add_argument("--workers", type=int, default=4, help="Searches that can run at the same time")
+     parser.add_argument("--table-mb", type=int, default=64, help="Size of each shared transposition table")
+     parser.add_argument("--book", default=None, help="Opening book made with openingBook.py")
+     parser.add_argument("--time-ms", type=int, default=DEFAULT_TIME_MS, help="Time per move when a request doesn't say")
+     arguments = parser.parse_args()
+
+     async def main():
+          service = MoveService(arguments.workers, arguments.table_mb, arguments.book, arguments.time_ms)
+          await service.start(arguments.host, arguments.port)
+          print(f"Serving moves on {arguments.host}:{service.port}")
+          await service.serve_forever()
+
+     asyncio.run(main())
@@ -0,0 +1,169 @@
+"""
+Opening book: best moves for every position in the first few plies, worked out once and saved to a file
+
+Making the book goes through every position you can reach from the empty board in up to `plies` moves
+(Player1 starting), searches each one with a normal Ai_player and writes the best row and its value.
+    python openingBook.py --rows 7 --columns 6 --nInRow 4 --plies 6 --depth 8 --output book.bin
+
+The file is a small header followed by fixed size records sorted by the position's Zobrist hash:
+    header: b"C4OB", version, rows, columns, nInRow, search depth, number of records
+    record: hash (8 bytes), value (4 bytes), row (1 byte)
+Since the records are sorted, a lookup is just a binary search in the file. The file is memory mapped
+and never read in as a whole, so opening it costs nothing, and every process that uses the same book
+shares one copy of it in the page cache.
+
+Books are version 1 (every position on its own hash) unless they are built with --symmetry.
+In a version 2 book a position and its mirror image (flipped left to right) are one record, stored
+under the smaller of Position.hash and Position.mirror_hash, with the row for that orientation.
+That halves the book. The heuristic isn't exactly the same for a position and its mirror, so the
+mirrored answer is only given to players with symmetry on (lookup(position, symmetry=True)), and it
+is the row flipped back. Other players only find the orientation that was really searched, about
+half the positions, so a version 2 book is only worth it for Ai_player(..., symmetry=True).
+"""
+
+import mmap
+import struct
+
+from bitboard import Position
+
+MAGIC = b"C4OB"
+VERSION = 2
+SYMMETRIC_VERSION = 2 # From this version on the records are shared with the mirror image
+HEADER = struct.Struct("<4sBBBBBI")
+RECORD = struct.Struct("<QiB")
+KEY = struct.Struct("<Q")
+
+# Values are stored as 32 bit ints
+VALUE_LIMIT = 2**31 - 1
+
+
+class OpeningBook():
+     def __init__(self, path):
+          self.path = path
+          self.file = None
+          self.data = None
+
+     def __getstate__(self):
+          # The memory map stays in this process, a copy in another process opens the file itself
+          return {"path": self.path, "file": None, "data": None}
+
+     def open(self):
+          if self.data is None:
+               self.file = open(self.path, "rb")
+               self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+               magic, version, self.rows, self.columns, self.nInRow, self.depth, self.count = HEADER.unpack_from(self.data, 0)
+               if magic != MAGIC or not 1 <= version <= VERSION:
+                    raise ValueError(f"{self.path} is not an opening book")
+               self.symmetric = version >= SYMMETRIC_VERSION
+
+     def close(self):
+          if self.data is not None:
+               self.data.close()
+               self.file.close()
+               self.data = None
+               self.file = None
+
+     def lookup(self, position, symmetry=False):
+          # Returns (value, row) for the player to move, or None if the position isn't in the book
+          # With symmetry, a mirrored position gets the stored answer flipped back
+          self.open()
+          if (position.rows, position.columns, position.nInRow) != (self.rows, self.columns, self.nInRow):
+               return None
+
+          wanted = position.hash
+          mirrored = False
+          if self.symmetric:
+               wanted = position.canonical_hash()
+               mirrored = position.is_mirrored()
+               if mirrored and not symmetry:
+                    return None # Only the mirror image was searched
+
+          low = 0
+          high = self.count - 1
+          while low <= high:
+               middle = (low + high) // 2
+               offset = HEADER.size + middle * RECORD.size
+               key = KEY.unpack_from(self.data, offset)[0]
+               if key < wanted:
+                    low = middle + 1
+               elif key > wanted:
+                    high = middle - 1
+               else:
+                    _, value, row = RECORD.unpack_from(self.data, offset)
+                    if mirrored:
+                         row = position.mirror_row(row)
+                    return (value, row) if position.can_play(row) else None
+          return None
+
+
+def book_positions(rows, columns, nInRow, plies, symmetry=False):
+     # Every position within plies moves of the empty board where the game isn't over yet, once each
+     # With symmetry, only one of a position and its mirror image
+     seen = set()
+     positions = []
+     frontier = [Position(rows, columns, nInRow)]
+     for ply in range(plies + 1):
+          next_frontier = []
+          for position in frontier:
+               key = position.canonical_hash() if symmetry else position.hash
+               if key in seen:
+                    continue
+               seen.add(key)
+               if position.has_won(0) or position.has_won(1) or position.full():
+                    continue
+               positions.append(position)
+               if ply < plies:
+                    for row in position.legal_rows():
+                         child = position.copy()
+                         child.play(row)
+                         next_frontier.append(child)
+          frontier = next_frontier
+     return positions
+
+def search_position(position, depth, symmetry=False):
+     # With symmetry the orientation under the smaller key is the one searched, so its record is exact
+     from algorithm import Ai_player
+     if symmetry and position.is_mirrored():
+          mirrored = Position(position.rows, position.columns, position.nInRow)
+          for row in position.history:
+               mirrored.play(position.mirror_row(row))
+          position = mirrored
+     value, row = Ai_player((0, 0, 0), "Book", depth).search(position)
+     return position.hash, max(-VALUE_LIMIT, min(VALUE_LIMIT, value)), row
+
+def build(path, rows, columns, nInRow, plies, depth, workers=1, symmetry=False):
+     positions = book_positions(rows, columns, nInRow, plies, symmetry)
+     if workers > 1:
+          import concurrent.futures
+          with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+               records = list(executor.map(search_position, positions, [depth] * len(positions), [symmetry] * len(positions), chunksize=16))
+     else:
+          records = [search_position(position, depth, symmetry) for position in positions]
+
+     records.sort()
+     with open(path, "wb") as file:
+          file.write(HEADER.pack(MAGIC, VERSION if symmetry else 1, rows, columns, nInRow, depth, len(records)))
+          for record in records:
+               file.write(RECORD.pack(*record))
+     return len(records)
+
+
+if __name__ == "__main__":
+     import argparse
+     import time
+
+     parser = argparse.ArgumentParser(description="Build an opening book")
+     parser.add_argument("--rows", type=int, default=7)
+     parser.add_argument("--columns", type=int, default=6)
+     parser.add_argument("--nInRow", type=int, default=4)
+     parser.add_argument("--plies", type=int, default=4, help="Every position up to this many moves in is searched")
+     parser.add_argument("--depth", type=int, default=8, help="Search depth for every book position")
+     parser.add_argument("--workers", type=int, default=1)
+     parser.add_argument("--output", default="book.bin")
+     parser.add_argument("--symmetry", action="store_true", help="One record for a position and its mirror image (a version 2 book, for players with symmetry on)")
+     arguments = parser.parse_args()
+
+     start = time.perf_counter()
+     count = build(arguments.output, arguments.rows, arguments.columns, arguments.nInRow, arguments.plies, arguments.depth, arguments.workers,
+                   arguments.symmetry)
+     print(f"Wrote {count} positions to {arguments.output} in {time.perf_counter() - start:.1f}s")
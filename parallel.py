@@ -0,0 +1,126 @@
+"""
+Searching the root moves on several cores
+
+Every root move (from Ai_player.get_all_rows, less the mirrored ones with symmetry on) is searched
+as its own job in a process pool, with the full window so each job comes back with the exact value
+of that move. The best one is then picked the same way as in the normal search (the highest value,
+and the rightmost row on ties), so the move doesn't depend on which worker finished first. With one worker there is no pool at all and the normal search runs.
+
+Every worker process keeps its own Ai_player (and its transposition table) between jobs.
+With a time limit every job gets the deadline as a time.time() clock time, not as seconds from when
+it was sent, so jobs that waited in the queue still stop when the move's time is up.
+
+Run this file to see the speedup and nodes/second for different worker counts:
+    python parallel.py --depth 7 --workers 1 2 4 8
+"""
+
+import concurrent.futures
+import time
+
+_worker_players = {}
+
+def search_root_move(settings, position, row, depth, deadline):
+     # Runs in the worker. Returns (value, nodes), or None if the time ran out
+     from algorithm import Ai_player, SearchTimeout
+     budget = None
+     if deadline is not None:
+          budget = deadline - time.time()
+          if budget <= 0:
+               return None
+     if settings not in _worker_players:
+          max_depth, alphabeta, table_mb, symmetry = settings
+          _worker_players[settings] = Ai_player((0, 0, 0), "Worker", max_depth, alphabeta, table_mb, symmetry=symmetry)
+     player = _worker_players[settings]
+     try:
+          value = player.search_root_move(position, row, depth, budget)
+     except SearchTimeout:
+          return None
+     return value, player.nodes
+
+
+class RootPool():
+     def __init__(self, workers):
+          self.workers = workers
+          self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+     def search(self, player, position, depth, deadline=None):
+          # Returns (value, row, nodes), or None if the deadline was hit before every root move was done
+          settings = (player.depth, player.alphabeta, player.table_mb, player.symmetry)
+          budget = None if deadline is None else max(0, deadline - time.perf_counter())
+          # perf_counter can't be compared between processes, time.time can
+          job_deadline = None if budget is None else time.time() + budget
+          jobs = {}
+          for row in player.root_rows(position, player.get_all_rows(position)):
+               jobs[self.executor.submit(search_root_move, settings, position, row, depth, job_deadline)] = row
+
+          done, not_done = concurrent.futures.wait(jobs, timeout=budget)
+          if not_done:
+               for job in not_done:
+                    job.cancel()
+               return None
+
+          best_value = float("-inf")
+          best_move = None
+          nodes = 1
+          for job, row in jobs.items():
+               result = job.result()
+               if result is None:
+                    return None
+               value, job_nodes = result
+               nodes += job_nodes
+               if value > best_value or (value == best_value and row > best_move):
+                    best_value = value
+                    best_move = row
+          return best_value, best_move, nodes
+
+     def close(self):
+          self.executor.shutdown(cancel_futures=True)
+
+
+def scaling_report(position, depth, worker_counts, **settings):
+     # Searches the same position with each worker count and returns one row of numbers per count
+     from algorithm import Ai_player
+     report = []
+     base_time = None
+     for workers in worker_counts:
+          player = Ai_player((0, 0, 0), "Benchmark", depth, workers=workers, **settings)
+          if workers > 1:
+               player.get_pool() # Don't count starting the processes
+          start = time.perf_counter()
+          value, row = player.search(position.copy())
+          seconds = time.perf_counter() - start
+          player.close()
+          if base_time is None:
+               base_time = seconds
+          report.append({
+               "workers": workers,
+               "move": row,
+               "value": value,
+               "nodes": player.nodes,
+               "seconds": seconds,
+               "nodes_per_second": player.nodes / seconds if seconds else 0,
+               "speedup": base_time / seconds if seconds else 0,
+          })
+     return report
+
+
+if __name__ == "__main__":
+     import argparse
+     from bitboard import Position
+
+     parser = argparse.ArgumentParser(description="Speedup of the parallel root search")
+     parser.add_argument("--rows", type=int, default=7)
+     parser.add_argument("--columns", type=int, default=6)
+     parser.add_argument("--nInRow", type=int, default=4)
+     parser.add_argument("--depth", type=int, default=7)
+     parser.add_argument("--moves", type=int, nargs="*", default=[], help="Rows played before the search")
+     parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+     arguments = parser.parse_args()
+
+     position = Position(arguments.rows, arguments.columns, arguments.nInRow)
+     for row in arguments.moves:
+          position.play(row)
+
+     print(f"{'workers':>8} {'move':>5} {'nodes':>10} {'seconds':>9} {'nodes/s':>10} {'speedup':>8}")
+     for line in scaling_report(position, arguments.depth, arguments.workers):
+          print(f"{line['workers']:>8} {line['move']:>5} {line['nodes']:>10} {line['seconds']:>9.3f} {line['nodes_per_second']:>10.0f} {line['speedup']:>8.2f}")
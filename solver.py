@@ -0,0 +1,246 @@
+"""
+Exact solver for the end of the game
+
+Close to the end there are few enough moves left that we can just play them all out, and then there is
+no guessing with the heuristic. The solver gives every position a score for the player to move:
+     0               draw with perfect play
+     positive        win, the sooner the higher: (cells + 1 - discs before the winning move) // 2
+     negative        loss, the same but the other way around
+It is a negamax with alpha-beta, which is called with a window of one (a null window) over and over to
+narrow down the score, like a binary search. A move under a spot where the opponent would win is
+never tried, and if the opponent threatens to win the only move searched is the block.
+
+Positions and their mirror images (the board flipped left to right) have the same score, so both
+share one entry in the transposition table and in the database. The database is an sqlite file that
+keeps every position we've solved, so the same endgame is only solved once:
+     solver = Solver(database="solved.sqlite")
+
+Solving the whole standard game from the start takes a very long time in Python, so that can be
+limited with a node budget:
+     python solver.py --rows 7 --columns 6 --budget 100000000
+"""
+
+import sqlite3
+import time
+
+from bitboard import Position
+from transposition import TranspositionTable, LOWER, UPPER
+
+
+# How many nodes are searched between each look at the clock
+CLOCK_CHECK_NODES = 1024
+
+class SolverBudgetExceeded(Exception):
+     # Raised when the solver has searched more nodes than it was allowed to, or ran out of time
+     pass
+
+
+class SolvedDatabase():
+     def __init__(self, path):
+          self.path = path
+          self.connection = sqlite3.connect(path, timeout=30)
+          self.connection.execute(
+               "CREATE TABLE IF NOT EXISTS solved (rows INTEGER, columns INTEGER, nInRow INTEGER, key BLOB, score INTEGER, "
+               "PRIMARY KEY (rows, columns, nInRow, key))")
+          self.connection.commit()
+
+     def __getstate__(self):
+          # sqlite connections can't be moved between processes, the copy connects again
+          return {"path": self.path}
+
+     def __setstate__(self, state):
+          self.__init__(state["path"])
+
+     def get(self, geometry, key):
+          found = self.connection.execute(
+               "SELECT score FROM solved WHERE rows = ? AND columns = ? AND nInRow = ? AND key = ?", (*geometry, key)).fetchone()
+          return None if found is None else found[0]
+
+     def put(self, geometry, key, score):
+          self.connection.execute("INSERT OR REPLACE INTO solved VALUES (?, ?, ?, ?, ?)", (*geometry, key, score))
+          self.connection.commit()
+
+     def count(self):
+          return self.connection.execute("SELECT COUNT(*) FROM solved").fetchone()[0]
+
+     def close(self):
+          self.connection.close()
+
+
+class Solver():
+     def __init__(self, database=None, table_mb=64, node_budget=None):
+          self.database = SolvedDatabase(database) if isinstance(database, str) else database
+          self.table = TranspositionTable(table_mb)
+          self.table_geometry = None
+          self.node_budget = node_budget
+          self.deadline = None # perf_counter time to give up at, set by whoever uses the solver
+          self.nodes = 0
+
+     def prepare(self, position):
+          geometry = (position.rows, position.columns, position.nInRow)
+          if self.table_geometry != geometry:
+               self.table.clear()
+               self.table_geometry = geometry
+               self.cells = position.rows * position.columns
+               self.column_mask = (1 << position.height) - 1
+               self.center_order = sorted(range(position.rows), key=lambda row: abs(2*row - (position.rows-1)))
+
+     def key(self, position):
+          # Unique for every position: the discs of the player to move, plus one bit on top of every row's discs
+          # The mirror image has the same score, so both use the smaller of the two keys
+          occupied = position.discs[0] | position.discs[1]
+          key = position.discs[position.turn] + occupied + position.bottom_mask
+          mirrored = 0
+          for row in range(position.rows):
+               mirrored |= ((key >> (row * position.height)) & self.column_mask) << ((position.rows - 1 - row) * position.height)
+          return min(key, mirrored)
+
+     def database_key(self, position):
+          key = self.key(position)
+          return key.to_bytes((key.bit_length() + 7) // 8, "little")
+
+     def solve(self, position):
+          # The exact score of the position for the player to move. The game must not be over already
+          self.prepare(position)
+          geometry = (position.rows, position.columns, position.nInRow)
+          if self.database is not None:
+               score = self.database.get(geometry, self.database_key(position))
+               if score is not None:
+                    return score
+
+          position = position.copy()
+          low = -((self.cells - position.moves) // 2)
+          high = (self.cells + 1 - position.moves) // 2
+          while low < high:
+               # Try the middle first, but lean towards 0 so draws and quick wins/losses are found fast
+               middle = low + (high - low) // 2
+               if middle <= 0 and low // 2 < middle:
+                    middle = low // 2
+               elif middle >= 0 and high // 2 > middle:
+                    middle = high // 2
+               score = self.negamax(position, middle, middle + 1)
+               if score <= middle:
+                    high = score
+               else:
+                    low = score
+
+          if self.database is not None:
+               self.database.put(geometry, self.database_key(position), low)
+          return low
+
+     def best_move(self, position):
+          # Returns (score, row) with the best score for the player to move
+          self.prepare(position)
+          playable = position.playable_mask()
+          wins = position.winning_spots(position.turn) & playable
+          if wins:
+               return (self.cells + 1 - position.moves) // 2, position.rows_in_mask(wins)[0]
+
+          best_score = None
+          best_move = None
+          for row in self.center_order:
+               if not position.can_play(row):
+                    continue
+               child = position.copy()
+               child.play(row)
+               score = -self.solve(child)
+               if best_score is None or score > best_score:
+                    best_score = score
+                    best_move = row
+          return best_score, best_move
+
+     def negamax(self, position, alpha, beta):
+          self.nodes += 1
+          if self.node_budget is not None and self.nodes > self.node_budget:
+               raise SolverBudgetExceeded()
+          if self.deadline is not None and self.nodes % CLOCK_CHECK_NODES == 0 and time.perf_counter() >= self.deadline:
+               raise SolverBudgetExceeded()
+
+          if position.full():
+               return 0
+
+          side = position.turn
+          playable = position.playable_mask()
+          if position.winning_spots(side) & playable:
+               return (self.cells + 1 - position.moves) // 2
+
+          # Don't play where the opponent wins next move, or right under a spot where they'd win
+          threats = position.winning_spots(side ^ 1)
+          forced = threats & playable
+          safe = playable & ~(threats >> 1)
+          if forced:
+               if forced & (forced - 1):
+                    return -((self.cells - position.moves) // 2) # Two threats at once, we can only block one
+               safe &= forced
+          if not safe:
+               return -((self.cells - position.moves) // 2)
+
+          # We can't win on this move, so the best we can hope for is winning with our next one
+          highest = (self.cells - 1 - position.moves) // 2
+          key = self.key(position)
+          entry = self.table.probe(key)
+          if entry is not None:
+               if entry[2] == UPPER:
+                    highest = min(highest, entry[3])
+               elif entry[2] == LOWER:
+                    alpha = max(alpha, entry[3])
+          if beta > highest:
+               beta = highest
+               if alpha >= beta:
+                    return beta
+          if alpha >= beta:
+               return alpha
+
+          for row in self.order_moves(position, safe):
+               position.play(row)
+               score = -self.negamax(position, -beta, -alpha)
+               position.undo()
+               if score >= beta:
+                    self.table.store(key, 0, LOWER, score, None)
+                    return score
+               if score > alpha:
+                    alpha = score
+
+          self.table.store(key, 0, UPPER, alpha, None)
+          return alpha
+
+     def order_moves(self, position, safe):
+          # Moves that make the most new threats first, then the middle rows
+          side = position.turn
+          moves = []
+          for row in self.center_order:
+               if position.heights[row] < position.columns and safe & position.bit(row, position.heights[row]):
+                    position.play(row)
+                    threats = bin(position.winning_spots(side)).count("1")
+                    position.undo()
+                    moves.append((-threats, len(moves), row))
+          moves.sort()
+          return [row for _, _, row in moves]
+
+
+if __name__ == "__main__":
+     import argparse
+
+     parser = argparse.ArgumentParser(description="Solve a position exactly")
+     parser.add_argument("--rows", type=int, default=7)
+     parser.add_argument("--columns", type=int, default=6)
+     parser.add_argument("--nInRow", type=int, default=4)
+     parser.add_argument("--moves", type=int, nargs="*", default=[], help="Rows played before solving, empty for the start")
+     parser.add_argument("--budget", type=int, default=None, help="Give up after this many nodes")
+     parser.add_argument("--database", default=None, help="sqlite file with solved positions")
+     parser.add_argument("--table-mb", type=int, default=256)
+     arguments = parser.parse_args()
+
+     position = Position(arguments.rows, arguments.columns, arguments.nInRow)
+     for row in arguments.moves:
+          position.play(row)
+
+     solver = Solver(arguments.database, arguments.table_mb, arguments.budget)
+     start = time.perf_counter()
+     try:
+          score, row = solver.best_move(position)
+     except SolverBudgetExceeded:
+          print(f"Gave up after {solver.nodes} nodes ({time.perf_counter() - start:.1f}s)")
+     else:
+          result = "a draw" if score == 0 else ("a win" if score > 0 else "a loss")
+          print(f"Score {score} ({result} for the player to move), best row {row}, {solver.nodes} nodes in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules live at the top of the repository, next to this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pygame can draw without a screen, for the display tests
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from algorithm import Ai_player
+from batch import evaluate_batch, search_batch
+from bitboard import Position
+
+
+def random_games(rows, columns, nInRow, count, seed):
+     # (board, position) pairs, the board laid out like Board.board with 0, 1 and 2
+     generator = random.Random(seed)
+     games = []
+     for _ in range(count):
+          position = Position(rows, columns, nInRow)
+          for _ in range(generator.randrange(0, rows * columns + 1)):
+               position.play(generator.choice(position.legal_rows()))
+          board = [[0 if position.cell(row, column) is None else position.cell(row, column) + 1 for column in range(columns)] for row in range(rows)]
+          games.append((board, position))
+     return games
+
+
+# The longer boards have lines too long for one int64 key per line
+@pytest.mark.parametrize("rows, columns, nInRow", [(7, 6, 4), (6, 7, 4), (5, 4, 3), (37, 6, 4), (40, 6, 4), (45, 5, 5), (3, 50, 3)])
+def test_batch_scores_match_evaluate(rows, columns, nInRow):
+     games = random_games(rows, columns, nInRow, 80, seed=rows * columns)
+     boards = np.array([board for board, _ in games], dtype=np.int8)
+     player = Ai_player((0, 0, 0), "Evaluator", 1)
+
+     expected = [player.evaluate(position, position.turn) for _, position in games]
+     assert evaluate_batch(boards, nInRow, chunk_size=32).tolist() == expected
+
+     sides = np.array([random.Random(index).randrange(2) for index in range(len(games))])
+     expected = [player.evaluate(position, side) for (_, position), side in zip(games, sides)]
+     assert evaluate_batch(iter(boards.tolist()), nInRow, side=sides, chunk_size=32).tolist() == expected
+
+
+def test_search_batch_does_not_depend_on_the_rest_of_the_batch():
+     # Short openings first, then the empty board: a table left over from them would give the empty board a deeper value
+     games = []
+     for moves in ([3, 3], [3, 2], [2, 4], [], [1], [3, 3, 3, 3]):
+          position = Position(7, 6, 4)
+          for row in moves:
+               position.play(row)
+          board = [[0 if position.cell(row, column) is None else position.cell(row, column) + 1 for column in range(6)] for row in range(7)]
+          games.append((board, position))
+     expected = [Ai_player((0, 0, 0), "Fresh", 3).search(position.copy()) for _, position in games]
+     boards = np.array([board for board, _ in games], dtype=np.int8)
+
+     # Each board gets what a fresh player finds for it, in any order, chunk size or number of workers
+     for order, chunk_size, workers in [(1, 256, 1), (-1, 256, 1), (1, 2, 1), (1, 3, 2), (-1, 1, 2)]:
+          values, rows = search_batch(boards[::order], depth=3, workers=workers, chunk_size=chunk_size)
+          assert list(zip(values.tolist(), rows.tolist())) == expected[::order]
@@ -0,0 +1,9 @@
+from benchmark import POSITIONS, measure
+from transposition import TranspositionTable
+
+
+def test_peak_memory_leaves_out_the_empty_table():
+     # The slot list of a 16 MB table alone is about 1.1 MB, a depth 2 search needs much less than that
+     table_bytes = 8 * len(TranspositionTable(16).slots)
+     result = measure("ai:depth=2", POSITIONS[0])
+     assert 0 < result["peak_memory"] < table_bytes // 4
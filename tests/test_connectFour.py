@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from connectFour import Board, Player
+
+
+# The win check as it was before, looking at the whole row, column and both diagonals through the disc
+def reference_check_list(board, squareList, nInRow):
+     for base in range(len(squareList) - nInRow + 1):
+          if squareList[base : base + nInRow].count(board.currentPlayer) == nInRow:
+               return True
+     return False
+
+def reference_diagonal(board, position, direction):
+     change = 1 if direction == "left" else -1
+     baseRow, baseCol = position
+     while not (baseRow - change < 0 or baseRow - change > board.rows-1 or baseCol-1 < 0):
+          baseRow -= change
+          baseCol -= 1
+
+     diagonalList = []
+     while True:
+          diagonalList.append(board.board[baseRow][baseCol])
+          baseRow += change
+          baseCol += 1
+          if baseRow < 0 or baseRow > board.rows-1 or baseCol > board.columns-1:
+               break
+     return diagonalList
+
+def reference_check_win(board, position, nInRow):
+     lists = [
+          [board.board[position[0]][column] for column in range(board.columns)],
+          [board.board[row][position[1]] for row in range(board.rows)],
+          reference_diagonal(board, position, "right"),
+          reference_diagonal(board, position, "left"),
+     ]
+     if any(reference_check_list(board, squareList, nInRow) for squareList in lists):
+          return True
+     return all(spot is not None for row in board.board for spot in row)
+
+
+@pytest.mark.parametrize("rows, columns, nInRow", [(7, 6, 4), (6, 7, 4), (4, 4, 3), (9, 7, 5), (3, 8, 2)])
+def test_check_win_matches_the_full_scan(rows, columns, nInRow):
+     generator = random.Random(rows * columns + nInRow)
+     board = Board(rows, columns, Player((255, 0, 0), "Red"), Player((255, 255, 0), "Yellow"), nInRow=nInRow, headless=True)
+     for _ in range(100):
+          board.game_init(board.Player1, board.Player2)
+          board.initPlayers()
+          while True:
+               row = generator.choice([row for row in range(rows) if board.getTopPos(row) >= 0])
+               move = (row, board.getTopPos(row))
+               board.place(move)
+               over = board.checkWin(move, nInRow)
+               assert over == reference_check_win(board, move, nInRow)
+               if over:
+                    break
+               board.alternatePlayers()
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+
+from connectFour import Board, Player
+
+
+def reference_frame(display, active_player, mouse_x):
+     # The whole window drawn from scratch, the way it was before only the changes were drawn
+     game = display.game
+     surface = pygame.Surface(display.windowSize)
+     surface.fill(display.darkGrey)
+     for row in range(game.rows):
+          for column in range(game.columns):
+               pygame.draw.rect(surface, display.lightGrey, display.getBoardRect(row, column))
+               spot = game.board[row][column]
+               color = display.darkGrey if spot is None else spot.color
+               pygame.draw.circle(surface, color, display.getBlockCenter(row, column), display.circleRadius)
+     if active_player:
+          row = display.getMouseRow(mouse_x)
+          if 0 <= row < game.rows and game.getTopPos(row) >= 0:
+               pygame.draw.circle(surface, active_player.greyColor, display.getBlockCenter(row, game.getTopPos(row)), display.circleRadius)
+     return pygame.image.tostring(surface, "RGB")
+
+
+def test_incremental_frames_match_a_full_redraw(monkeypatch):
+     generator = random.Random(7)
+     mouse = [0, 0]
+     monkeypatch.setattr(pygame.mouse, "get_pos", lambda: tuple(mouse))
+
+     board = Board(7, 6, Player((255, 0, 0), "Red"), Player((255, 255, 0), "Yellow"), squareSize=40)
+     display = board.display
+     try:
+          for _ in range(3):
+               board.game_init(board.Player1, board.Player2)
+               board.initPlayers()
+               while not board.full_board():
+                    # A few mouse moves while the player picks, then the move itself
+                    for _ in range(generator.randrange(4)):
+                         mouse[0] = generator.randrange(-20, display.windowSize[0] + 20)
+                         display.draw(active_player=board.currentPlayer)
+                         assert pygame.image.tostring(display.screen, "RGB") == reference_frame(display, board.currentPlayer, mouse[0])
+                    row = generator.choice([row for row in range(board.rows) if board.getTopPos(row) >= 0])
+                    board.place((row, board.getTopPos(row)))
+                    board.draw()
+                    assert pygame.image.tostring(display.screen, "RGB") == reference_frame(display, False, mouse[0])
+                    board.alternatePlayers()
+     finally:
+          pygame.quit()
@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from algorithm import Ai_player
+from bitboard import Position
+
+
+# The evaluation as it was before the bitboards, on a nested list board holding 0, 1 or None
+def reference_evaluate(board, rows, columns, nInRow, side):
+     own_score = 0
+     other_score = 0
+     for row in range(rows):
+          for column in range(columns):
+               if board[row][column] is None:
+                    continue
+               for line in reference_lines(board, rows, columns, row, column):
+                    own_score += reference_evaluate_list(list(line), side, nInRow)
+                    other_score += reference_evaluate_list(list(line), side ^ 1, nInRow)
+
+     middle_rows = [rows//2, rows//2 + 1] if rows % 2 == 0 else [rows//2]
+     for row in middle_rows:
+          own_score += board[row].count(side) * 4
+          other_score += board[row].count(side ^ 1) * 4
+     return own_score - other_score
+
+def reference_lines(board, rows, columns, row, column):
+     lines = [board[row][column:], [board[r][column] for r in range(row, rows)]]
+     for change in (1, -1):
+          line = []
+          r, c = row, column
+          while True:
+               line.append(board[r][c])
+               c += 1
+               r += change
+               if r < 0 or r > rows - 1 or c > columns - 1:
+                    break
+          lines.append(line)
+     return lines
+
+def reference_evaluate_list(positions, side, nInRow):
+     score = 0
+     if len(positions) < 2:
+          return score
+
+     while len(positions) > nInRow:
+          disc_count = 0
+          for position in positions[:nInRow]:
+               if position is None:
+                    continue
+               elif position == side:
+                    disc_count += 1
+               else:
+                    if disc_count <= 1:
+                         disc_count = 0
+                    return score + disc_count
+          positions.pop(0)
+          if disc_count == nInRow:
+               score += 100000
+          elif disc_count > 1:
+               score += disc_count
+
+     for square in positions:
+          if square is not None and square != side:
+               return score
+
+     while len(positions) > 1:
+          count = positions.count(side)
+          if count > 1:
+               if count == nInRow:
+                    score += 100000
+               score += count
+          positions.pop(0)
+     return score
+
+
+@pytest.mark.parametrize("rows, columns, nInRow", [(7, 6, 4), (6, 7, 4), (5, 4, 3), (9, 7, 5), (3, 8, 3)])
+def test_evaluate_matches_the_nested_list_version(rows, columns, nInRow):
+     generator = random.Random(rows * columns * nInRow)
+     player = Ai_player((0, 0, 0), "Evaluator", 1)
+     for _ in range(60):
+          position = Position(rows, columns, nInRow)
+          # Games are not stopped at a win, the heuristic has to score those boards too
+          for _ in range(generator.randrange(0, rows * columns + 1)):
+               position.play(generator.choice(position.legal_rows()))
+          board = [[position.cell(row, column) for column in range(columns)] for row in range(rows)]
+          for side in (0, 1):
+               assert player.evaluate(position, side) == reference_evaluate(board, rows, columns, nInRow, side)
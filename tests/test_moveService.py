@@ -0,0 +1,136 @@
+import asyncio
+import json
+import threading
+
+from algorithm import Ai_player
+from bitboard import Position
+from moveService import MoveService, MoveClient
+
+
+def run(test):
+     # Starts a service on a free local port, runs test(service) and shuts everything down
+     async def main():
+          service = MoveService(workers=2, table_mb=1)
+          await service.start("127.0.0.1", 0)
+          try:
+               return await test(service)
+          finally:
+               await service.close()
+     return asyncio.run(main())
+
+async def send_lines(port, *lines):
+     # Sends raw lines and returns one reply per line that should get one
+     reader, writer = await asyncio.open_connection("127.0.0.1", port)
+     replies = []
+     for line in lines:
+          writer.write(line.encode() + b"\n")
+          await writer.drain()
+          replies.append(json.loads(await asyncio.wait_for(reader.readline(), 10)))
+     writer.close()
+     await writer.wait_closed()
+     return replies
+
+async def wait_for_players(service):
+     # Every search has stopped once all players are back in the pool
+     for _ in range(200):
+          if service.players.qsize() == service.workers:
+               return True
+          await asyncio.sleep(0.05)
+     return False
+
+
+def test_reply_matches_a_normal_search():
+     async def test(service):
+          client = await MoveClient.connect("127.0.0.1", service.port)
+          reply = await client.request_move(7, 6, 4, [3, 3, 2], depth=5, time_ms=60000)
+          await client.close()
+          return reply
+
+     reply = run(test)
+     position = Position(7, 6, 4)
+     for row in [3, 3, 2]:
+          position.play(row)
+     value, row = Ai_player((0, 0, 0), "Reference", 5).search(position)
+     assert (reply["value"], reply["row"]) == (value, row)
+     assert reply["depth"] == 5
+     assert reply["id"] == 0
+
+def test_cancel_stops_the_search():
+     async def test(service):
+          client = await MoveClient.connect("127.0.0.1", service.port)
+          search = asyncio.create_task(client.request_move(7, 6, 4, [], time_ms=60000))
+          await asyncio.sleep(0.3)
+          search.cancel()
+          stopped = await wait_for_players(service)
+          reply = await client.request_move(7, 6, 4, [3], depth=2)
+          await client.close()
+          return stopped, reply
+
+     stopped, reply = run(test)
+     assert stopped
+     assert "row" in reply
+
+def test_disconnect_after_cancel_gives_the_players_back():
+     release = threading.Event()
+
+     async def test(service):
+          search = service.search
+
+          def slow_search(*arguments):
+               # Keeps the thread busy after the cancel, until the client is gone
+               release.wait(10)
+               return search(*arguments)
+
+          service.search = slow_search
+          reader, writer = await asyncio.open_connection("127.0.0.1", service.port)
+          for request_id in range(service.workers):
+               request = {"id": request_id, "rows": 7, "columns": 6, "moves": [request_id], "time_ms": 60000}
+               writer.write((json.dumps(request) + "\n").encode())
+          await writer.drain()
+          await asyncio.sleep(0.2)
+          for request_id in range(service.workers):
+               writer.write((json.dumps({"cancel": request_id}) + "\n").encode())
+          await writer.drain()
+          await asyncio.sleep(0.2)
+          writer.close()
+          await writer.wait_closed()
+          await asyncio.sleep(0.2)
+          release.set()
+          stopped = await wait_for_players(service)
+          service.search = search
+          client = await MoveClient.connect("127.0.0.1", service.port)
+          reply = await asyncio.wait_for(client.request_move(7, 6, 4, [], depth=2), 10)
+          await client.close()
+          return stopped, reply
+
+     stopped, reply = run(test)
+     assert stopped
+     assert "row" in reply
+
+def test_bad_requests_get_an_error_reply():
+     bad = [
+          '{"id": 1, "cells": []}',
+          '{"id": 2, "cells": [[0, 0, 3], [0, 0, 0]]}',
+          '{"id": 3, "cells": [[0, 1, 0], [0, 0, 0]]}',
+          '{"id": 4, "cells": [[0, 0], [0]]}',
+          '{"id": 5, "rows": 7, "columns": 6, "moves": [3, 9]}',
+          '{"id": 6, "rows": 7, "columns": 6, "moves": "33"}',
+          '{"id": 7, "rows": "7", "columns": 6}',
+          '{"id": 8, "rows": 7, "columns": 6, "time_ms": -5}',
+          '{"id": 9, "rows": 7, "columns": 6, "moves": [0, 1, 0, 1, 0, 1, 0]}',
+          '5',
+          '[1, 2]',
+          'not json',
+          '{"id": [1], "rows": 7, "columns": 6}',
+     ]
+
+     async def test(service):
+          replies = await send_lines(service.port, *bad)
+          # The connection still works after all of that
+          good = await send_lines(service.port, '{"id": "fine", "rows": 5, "columns": 4, "nInRow": 3, "depth": 2}')
+          return replies, good
+
+     replies, good = run(test)
+     assert all("error" in reply for reply in replies)
+     assert [reply["id"] for reply in replies[:9]] == list(range(1, 10))
+     assert good[0]["id"] == "fine" and "row" in good[0]
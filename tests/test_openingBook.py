@@ -0,0 +1,57 @@
+import pytest
+
+from algorithm import Ai_player
+from openingBook import OpeningBook, book_positions, build
+
+
+DEPTH = 2
+
+def reachable(plies):
+     # Both orientations of every book position, with what a fresh search of that exact position gives
+     return [(position, Ai_player((0, 0, 0), "Fresh", DEPTH).search(position.copy())) for position in book_positions(7, 6, 4, plies)]
+
+
+@pytest.mark.parametrize("symmetry", [False, True])
+def test_a_default_book_answers_every_position_for_both_kinds_of_player(tmp_path, symmetry):
+     path = str(tmp_path / "book.bin")
+     positions = reachable(3)
+     assert build(path, 7, 6, 4, 3, DEPTH) == len(positions)
+
+     book = OpeningBook(path)
+     try:
+          for position, expected in positions:
+               assert book.lookup(position, symmetry) == expected
+     finally:
+          book.close()
+
+def test_a_symmetric_book_is_half_the_size_and_exact_for_symmetry_players(tmp_path):
+     path = str(tmp_path / "book.bin")
+     positions = reachable(3)
+     count = build(path, 7, 6, 4, 3, DEPTH, symmetry=True)
+     assert count < len(positions)
+
+     book = OpeningBook(path)
+     try:
+          found = 0
+          for position, expected in positions:
+               answer = book.lookup(position, symmetry=True)
+               assert answer is not None
+               if not position.is_mirrored():
+                    # The orientation that was searched gets exactly its own answer
+                    assert answer == expected
+               # Players without symmetry never get a flipped answer
+               plain = book.lookup(position)
+               assert plain is None or plain == expected
+               found += plain is not None
+          assert found == count
+     finally:
+          book.close()
+
+def test_players_use_the_book(tmp_path):
+     path = str(tmp_path / "book.bin")
+     build(path, 7, 6, 4, 2, DEPTH)
+     player = Ai_player((0, 0, 0), "Booked", 6, book=path)
+     position, expected = reachable(2)[-1]
+     assert player.search(position.copy()) == expected
+     assert player.source == "book"
+     player.book.close()
@@ -0,0 +1,30 @@
+import random
+
+import pytest
+
+from algorithm import Ai_player
+from bitboard import Position
+
+
+def random_positions(rows, columns, nInRow, count, seed):
+     # Positions a few random moves into a game, none of them over yet
+     generator = random.Random(seed)
+     positions = []
+     while len(positions) < count:
+          position = Position(rows, columns, nInRow)
+          for _ in range(generator.randrange(0, rows * columns // 2)):
+               position.play(generator.choice(position.legal_rows()))
+               if position.has_won(0) or position.has_won(1) or position.full():
+                    break
+          else:
+               positions.append(position)
+     return positions
+
+
+@pytest.mark.parametrize("rows, columns, nInRow, depth", [(7, 6, 4, 3), (7, 6, 4, 4), (5, 4, 3, 5), (6, 5, 4, 4)])
+def test_alphabeta_picks_the_same_move_as_minimax(rows, columns, nInRow, depth):
+     # The same alpha-beta player for every position, so what it remembers from earlier searches gets used too
+     minimax = Ai_player((0, 0, 0), "Minimax", depth, alphabeta=False)
+     alphabeta = Ai_player((0, 0, 0), "Alphabeta", depth)
+     for position in random_positions(rows, columns, nInRow, 12, seed=rows * 100 + depth):
+          assert alphabeta.search(position.copy()) == minimax.search(position.copy())
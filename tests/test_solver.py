@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from bitboard import Position
+from solver import Solver
+
+
+def brute_force(position, seen):
+     # Every move played out, no pruning: the score the solver should find
+     key = (position.discs[0], position.discs[1])
+     if key not in seen:
+          side = position.turn
+          cells = position.rows * position.columns
+          best = None
+          for row in position.legal_rows():
+               position.play(row)
+               if position.has_won(side):
+                    score = (cells + 1 - (position.moves - 1)) // 2
+               elif position.full():
+                    score = 0
+               else:
+                    score = -brute_force(position, seen)
+               position.undo()
+               best = score if best is None else max(best, score)
+          seen[key] = best
+     return seen[key]
+
+def random_positions(rows, columns, nInRow, count, seed):
+     # Positions with at most 13 empty spots left where the game isn't over
+     generator = random.Random(seed)
+     positions = []
+     while len(positions) < count:
+          position = Position(rows, columns, nInRow)
+          over = False
+          for _ in range(max(0, rows * columns - generator.randrange(4, 14))):
+               position.play(generator.choice(position.legal_rows()))
+               if position.has_won(0) or position.has_won(1):
+                    over = True
+                    break
+          if not over and not position.full():
+               positions.append(position)
+     return positions
+
+
+@pytest.mark.parametrize("rows, columns, nInRow", [(4, 4, 3), (5, 4, 4), (4, 5, 3), (5, 4, 3), (3, 4, 3), (4, 4, 4)])
+def test_solver_matches_brute_force(rows, columns, nInRow):
+     solver = Solver()
+     seen = {}
+     for position in random_positions(rows, columns, nInRow, 25, seed=rows * 10 + columns + nInRow):
+          expected = brute_force(position.copy(), seen)
+          assert solver.solve(position) == expected
+          score, row = solver.best_move(position)
+          assert score == expected
+          # The row it picked is one that gets that score
+          child = position.copy()
+          child.play(row)
+          if child.has_won(position.turn):
+               assert expected == (rows * columns + 1 - position.moves) // 2
+          else:
+               assert expected == (0 if child.full() else -brute_force(child, seen))
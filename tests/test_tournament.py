@@ -0,0 +1,20 @@
+import pytest
+
+from bitboard import Position
+from tournament import make_player
+
+
+def test_time_limited_players_are_not_held_to_the_default_depth():
+     assert make_player("ai", (0, 0, 0)).depth == 4
+     assert make_player("ai:depth=6", (0, 0, 0)).depth == 6
+     assert make_player("ai:time=100:depth=6", (0, 0, 0)).depth == 6
+
+     player = make_player("ai:time=200", (0, 0, 0))
+     assert player.depth is None and player.time_limit_ms == 200
+     player.search(Position(7, 6, 4))
+     assert player.completed_depth > 4
+
+@pytest.mark.parametrize("spec", ["ai:dpeth=7", "ai:depth=4:tiem=100", "ai:depth", "ai:depth=deep", "human"])
+def test_bad_player_descriptions_are_refused(spec):
+     with pytest.raises(ValueError):
+          make_player(spec, (0, 0, 0))
@@ -0,0 +1,194 @@
+"""
+Headless self-play tournaments
+
+Plays a lot of games between ai settings on a process pool, without any window. Every finished game is
+written as one line of JSON straight away (so nothing is lost if we stop halfway), and at the end the
+win rates and Elo ratings for every player are printed.
+
+Players are written as "random" or "ai" with settings after colons, for example
+    ai:depth=4                  fixed depth (depth 4 is also what an ai without depth or time gets)
+    ai:time=200                 iterative deepening with 200 ms per move, as deep as the time allows
+    ai:time=200:depth=8         the same, but never deeper than 8
+    ai:depth=6:table=0          no transposition table
+    ai:depth=4:alphabeta=0      the full-width minimax
+    ai:depth=6:sym=1            mirrored positions share the transposition table
+A pairing is two players with a comma, and boards are rows x columns x nInRow:
+    python tournament.py --games 200 --pairing ai:depth=4,random --pairing ai:depth=4,ai:time=100 --board 7x6x4 --output results.jsonl
+
+The two players switch who goes first every other game. Game i is played with the seed seed + i, so a
+tournament can be played again with the same results.
+"""
+
+import concurrent.futures
+import json
+import random
+import time
+
+from connectFour import Board
+from algorithm import Ai_player, Random_player
+from gameRecord import GameWriter, UNFINISHED, PLAYER1_WON, PLAYER2_WON, DRAW
+
+COLORS = ((255, 0, 0), (255, 255, 0))
+
+# Everything that can come after "ai:"
+SETTINGS = ("depth", "time", "table", "alphabeta", "workers", "sym")
+
+def make_player(spec, color):
+     # Build a player from its description, like "random" or "ai:depth=4:time=200"
+     kind, *options = spec.split(":")
+     if kind == "random":
+          return Random_player(color, spec)
+     if kind != "ai":
+          raise ValueError(f"Unknown player {spec!r}, use random or ai")
+
+     settings = {}
+     for option in options:
+          key, value = option.split("=")
+          settings[key] = int(value)
+     unknown = sorted(set(settings) - set(SETTINGS))
+     if unknown:
+          raise ValueError(f"Unknown setting {', '.join(unknown)} in {spec!r}, use {', '.join(SETTINGS)}")
+
+     # A time limit deepens until the time is up, so the default depth is only for players without one
+     depth = settings.get("depth", None if "time" in settings else 4)
+     return Ai_player(color, spec, depth or None,
+                      alphabeta=bool(settings.get("alphabeta", 1)),
+                      table_mb=settings.get("table", 16),
+                      time_limit_ms=settings.get("time"),
+                      workers=settings.get("workers", 1),
+                      symmetry=bool(settings.get("sym", 0)))
+
+def parse_board(text):
+     rows, columns, nInRow = (int(number) for number in text.lower().split("x"))
+     return rows, columns, nInRow
+
+def schedule(games, pairings, boards, seed):
+     # One job per game, going round the pairings and boards, and swapping who starts every other game
+     jobs = []
+     for game in range(games):
+          first, second = pairings[game % len(pairings)]
+          rows, columns, nInRow = boards[(game // len(pairings)) % len(boards)]
+          if (game // (len(pairings) * len(boards))) % 2 == 1:
+               first, second = second, first
+          jobs.append({"game": game, "seed": seed + game, "first": first, "second": second,
+                       "rows": rows, "columns": columns, "nInRow": nInRow})
+     return jobs
+
+def play_game(job):
+     # Runs in the worker, plays one headless game and returns the record for the JSONL file
+     random.seed(job["seed"])
+     first = make_player(job["first"], COLORS[0])
+     second = make_player(job["second"], COLORS[1])
+     game = Board(job["rows"], job["columns"], first, second, nInRow=job["nInRow"], headless=True)
+     start = time.perf_counter()
+     winner = game.play()
+     seconds = time.perf_counter() - start
+     for player in (first, second):
+          if isinstance(player, Ai_player):
+               player.close()
+
+     record = dict(job)
+     record["winner"] = None if winner is None else ("first" if winner is first else "second")
+     record["moves"] = [move[0] for move in game.moves]
+     record["plies"] = len(game.moves)
+     record["move_ms"] = [round(seconds * 1000, 3) for seconds in game.move_times]
+     record["seconds"] = round(seconds, 3)
+     return record
+
+def write_game(writer, record):
+     # The first player is always Player1 on the board
+     result = {None: DRAW if record["plies"] == record["rows"] * record["columns"] else UNFINISHED,
+               "first": PLAYER1_WON, "second": PLAYER2_WON}[record["winner"]]
+     writer.write(record["rows"], record["columns"], record["nInRow"], record["moves"], (record["first"], record["second"]), result)
+     writer.flush()
+
+def run(jobs, output, workers=None, games=None):
+     # Plays the games on a pool and writes each record as soon as it is done. Returns all records
+     # With games (a path), every game is also appended to that game record file (see gameRecord.py)
+     records = []
+     writer = GameWriter(games) if games else None
+     try:
+          with open(output, "a") as file, concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+               for future in concurrent.futures.as_completed([executor.submit(play_game, job) for job in jobs]):
+                    record = future.result()
+                    file.write(json.dumps(record) + "\n")
+                    file.flush()
+                    if writer is not None:
+                         write_game(writer, record)
+                    records.append(record)
+     finally:
+          if writer is not None:
+               writer.close()
+     return records
+
+def player_results(records):
+     # wins, draws and losses for each player description
+     results = {}
+     for record in records:
+          for side in ("first", "second"):
+               result = results.setdefault(record[side], {"games": 0, "wins": 0, "draws": 0, "losses": 0})
+               result["games"] += 1
+               if record["winner"] is None:
+                    result["draws"] += 1
+               elif record["winner"] == side:
+                    result["wins"] += 1
+               else:
+                    result["losses"] += 1
+     return results
+
+def elo_ratings(records, iterations=200, base=1500):
+     # Fits one rating per player to all the results at once (so the order the games finished in doesn't matter)
+     # A game between two copies of the same player doesn't tell us anything and is skipped
+     games = [(record["first"], record["second"], 0.5 if record["winner"] is None else float(record["winner"] == "first"))
+              for record in records if record["first"] != record["second"]]
+     ratings = {name: 0.0 for game in games for name in game[:2]}
+     for _ in range(iterations):
+          change = {name: 0.0 for name in ratings}
+          count = {name: 0 for name in ratings}
+          for first, second, score in games:
+               expected = 1 / (1 + 10 ** ((ratings[second] - ratings[first]) / 400))
+               change[first] += score - expected
+               change[second] -= score - expected
+               count[first] += 1
+               count[second] += 1
+          for name in ratings:
+               ratings[name] += 32 * change[name] / count[name]
+          # Keep the average where it is, only the differences mean anything
+          average = sum(ratings.values()) / len(ratings) if ratings else 0
+          for name in ratings:
+               ratings[name] -= average
+     return {name: base + rating for name, rating in ratings.items()}
+
+def print_summary(records):
+     results = player_results(records)
+     ratings = elo_ratings(records)
+     print(f"{len(records)} games")
+     print(f"{'player':<30} {'games':>6} {'wins':>6} {'draws':>6} {'losses':>6} {'win rate':>9} {'elo':>7}")
+     for name, result in sorted(results.items(), key=lambda item: -ratings.get(item[0], 0)):
+          win_rate = result["wins"] / result["games"]
+          elo = f"{ratings[name]:.0f}" if name in ratings else "-"
+          print(f"{name:<30} {result['games']:>6} {result['wins']:>6} {result['draws']:>6} {result['losses']:>6} {win_rate:>9.1%} {elo:>7}")
+
+
+if __name__ == "__main__":
+     import argparse
+
+     parser = argparse.ArgumentParser(description="Play a headless tournament between ai settings")
+     parser.add_argument("--games", type=int, default=100)
+     parser.add_argument("--pairing", action="append", help="Two players with a comma, like ai:depth=4,random")
+     parser.add_argument("--board", action="append", help="rows x columns x nInRow, like 7x6x4")
+     parser.add_argument("--seed", type=int, default=0)
+     parser.add_argument("--workers", type=int, default=None, help="Processes to play on (default: one per core)")
+     parser.add_argument("--output", default="tournament.jsonl")
+     parser.add_argument("--record", default=None, help="Also append every game to this game record file")
+     arguments = parser.parse_args()
+
+     pairings = [tuple(pairing.split(",")) for pairing in (arguments.pairing or ["ai:depth=4,random"])]
+     boards = [parse_board(board) for board in (arguments.board or ["7x6x4"])]
+     for pairing in pairings:
+          if len(pairing) != 2:
+               parser.error(f"A pairing needs two players: {','.join(pairing)}")
+
+     jobs = schedule(arguments.games, pairings, boards, arguments.seed)
+     records = run(jobs, arguments.output, arguments.workers, arguments.record)
+     print_summary(records)
@@ -0,0 +1,90 @@
+"""
+Transposition table for the Ai_player search
+
+Positions are stored by their Zobrist hash (Position.hash). The table is a fixed number of buckets,
+and each bucket has two slots:
+  - the first slot keeps whatever was searched the deepest (depth-preferred)
+  - the second slot is overwritten by everything else (always-replace)
+so deep results survive for a long time, while the table still learns about the latest positions.
+
+Values are stored from the point of view of the ai that owns the table, together with a bound type:
+  EXACT - the value is the real minimax value at that depth
+  LOWER - the search failed high, the real value is at least this
+  UPPER - the search failed low, the real value is at most this
+"""
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Rough size of one stored entry in bytes (the tuple, its ints and the slot in the list)
+ENTRY_BYTES = 120
+
+
+class TranspositionTable():
+     def __init__(self, size_mb=16):
+          self.size_mb = size_mb
+          self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * ENTRY_BYTES))
+          self.clear()
+
+     def clear(self):
+          # Entries are (key, depth, bound, value, move)
+          self.slots = [None] * (2 * self.buckets)
+          self.filled = 0
+          self.probes = 0
+          self.hits = 0
+          self.collisions = 0
+          self.stores = 0
+
+     def probe(self, key):
+          self.probes += 1
+          index = 2 * (key % self.buckets)
+          collision = False
+          for slot in (index, index + 1):
+               entry = self.slots[slot]
+               if entry is None:
+                    continue
+               if entry[0] == key:
+                    self.hits += 1
+                    return entry
+               collision = True
+          if collision:
+               self.collisions += 1
+          return None
+
+     def store(self, key, depth, bound, value, move):
+          self.stores += 1
+          index = 2 * (key % self.buckets)
+          entry = (key, depth, bound, value, move)
+          deep = self.slots[index]
+          if deep is None or deep[0] == key or depth >= deep[1]:
+               if deep is None:
+                    self.filled += 1
+               elif deep[0] != key and self.slots[index + 1] is None:
+                    # The old deep entry gets one more life in the always-replace slot
+                    self.slots[index + 1] = deep
+                    self.filled += 1
+               self.slots[index] = entry
+               return
+
+          if self.slots[index + 1] is None:
+               self.filled += 1
+          self.slots[index + 1] = entry
+
+     def hit_rate(self):
+          return self.hits / self.probes if self.probes else 0
+
+     def occupancy(self):
+          return self.filled / len(self.slots)
+
+     def stats(self):
+          return {
+               "size_mb": self.size_mb,
+               "slots": len(self.slots),
+               "probes": self.probes,
+               "hits": self.hits,
+               "hit_rate": self.hit_rate(),
+               "collisions": self.collisions,
+               "stores": self.stores,
+               "occupancy": self.occupancy(),
+          }